@@ -0,0 +1,179 @@
+# ai_tutor/answer_cache.py
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+# The disk tier is trimmed back to max_disk_entries once per this many puts
+# rather than on every write
+_PRUNE_EVERY = 64
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    q = " ".join(question.lower().split())
+    return re.sub(r"[\s?!.]+$", "", q)
+
+
+def cache_scope(
+    use_finetuned: bool,
+    context: Optional[str],
+    sampling: dict,
+    max_tokens: int,
+    adapter: Optional[str] = None,
+    grammar: bool = False,
+    early_stop: bool = False,
+) -> str:
+    """Everything besides the question that determines an answer."""
+    payload = {
+        "finetuned": use_finetuned,
+        "adapter": adapter,
+        "grammar": grammar,
+        "early_stop": early_stop,
+        "context": hashlib.sha256((context or "").encode("utf-8")).hexdigest(),
+        "sampling": sampling,
+        "max_tokens": max_tokens,
+    }
+    raw = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(question: str, scope: str) -> str:
+    """Exact-match key: normalized question within a cache_scope()."""
+    raw = f"{scope}\n{normalize_question(question)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Two-tier cache for generated answers.
+
+    - Memory: LRU bounded by `max_entries`, entries expire after `ttl_seconds`.
+    - Disk (optional): sqlite file at `db_path`, so popular answers survive a
+      container restart. Disk hits are promoted back into memory. It may hold
+      up to _PRUNE_EVERY rows over `max_disk_entries` between trims.
+
+    With a disk tier, get() and put() do blocking sqlite I/O; async callers
+    should run them in a thread (see `on_disk`).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 24 * 3600,
+        db_path: Optional[Path] = None,
+        max_disk_entries: int = 10_000,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[float, str, str]] = OrderedDict()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._puts = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, answer TEXT, model_type TEXT, created REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_created ON answers(created)")
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def on_disk(self) -> bool:
+        return self._db is not None
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return (answer, model_type) for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, answer, model_type = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return answer, model_type
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, answer, model_type FROM answers WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and now - row[0] <= self.ttl_seconds:
+                    self._remember(key, row)
+                    self._disk_hits += 1
+                    return row[1], row[2]
+
+            self._misses += 1
+            return None
+
+    def put(self, key: str, answer: str, model_type: str) -> None:
+        entry = (time.time(), answer, model_type)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (key, answer, model_type, created) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, answer, model_type, entry[0]),
+                )
+                self._puts += 1
+                if self._puts % _PRUNE_EVERY == 0:
+                    # Keep only the newest max_disk_entries rows
+                    self._db.execute(
+                        "DELETE FROM answers WHERE key IN ("
+                        "SELECT key FROM answers ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,),
+                    )
+                self._db.commit()
+
+    def purge(self) -> int:
+        """Drop every entry from both tiers; returns how many were removed."""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            if self._db is not None:
+                removed = max(removed, self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0])
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+                "disk": self._db is not None,
+            }
+
+    def _remember(self, key: str, entry: Tuple[float, str, str]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -38,6 +38,13 @@ class ConfigClass:
         )
     )
 
+    # LoRA GGUF adapters served by llama_backend: every *.gguf in
+    # lora_gguf_dir (default models/lora_gguf) is selectable by file stem via
+    # ChatRequest.adapter. At most lora_max_resident are loaded at once.
+    lora_gguf_dir: str = os.getenv("LORA_GGUF_DIR", "")
+    lora_default_adapter: str = os.getenv("LORA_DEFAULT_ADAPTER", "")
+    lora_max_resident: int = int(os.getenv("LORA_MAX_RESIDENT", "2"))
+
     # Embedding model for RAG
     embedding_model_id: str = os.getenv(
         "EMBEDDING_MODEL_ID",
@@ -47,6 +54,77 @@ class ConfigClass:
     # RAG index path
     rag_index_path: Path = Path(os.getenv("RAG_INDEX_PATH", str(rag_index_dir)))
 
+    # Load the RAG index + embedder when the API starts instead of on first use
+    rag_warmup: bool = os.getenv("RAG_WARMUP", "0") == "1"
+
+    # Course material for the RAG index (directory of .md/.txt/code files and/or
+    # .jsonl), split into overlapping chunks of at most rag_chunk_tokens
+    # embedder tokens and embedded rag_embed_batch_size chunks at a time.
+    rag_corpus_path: Path = Path(os.getenv("RAG_CORPUS_PATH", str(data_dir / "rag_corpus")))
+    rag_chunk_tokens: int = int(os.getenv("RAG_CHUNK_TOKENS", "200"))
+    rag_chunk_overlap: int = int(os.getenv("RAG_CHUNK_OVERLAP", "40"))
+    rag_embed_batch_size: int = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+    # Full builds with RAG_EMBED_WORKERS > 1 encode shards of this many chunks
+    # in a process pool, checkpointing each shard so builds can resume.
+    rag_embed_workers: int = int(os.getenv("RAG_EMBED_WORKERS", "1"))
+    rag_embed_shard_size: int = int(os.getenv("RAG_EMBED_SHARD_SIZE", "2048"))
+
+    # Incremental index updates tombstone removed/edited chunks; the index is
+    # rewritten without them once they exceed this fraction of all rows.
+    rag_compact_ratio: float = float(os.getenv("RAG_COMPACT_RATIO", "0.25"))
+
+    # Storage precision of the (L2-normalized) RAG embeddings: "float32" or
+    # "float16" (half the disk and page cache, scored in float32 blocks).
+    rag_embedding_dtype: str = os.getenv("RAG_EMBEDDING_DTYPE", "float32")
+
+    # "dense", "hybrid" (dense + BM25 fused by reciprocal rank) or "prefilter"
+    # (BM25 candidates ranked by embedding similarity).
+    rag_retrieval_mode: str = os.getenv("RAG_RETRIEVAL_MODE", "dense")
+    rag_hybrid_depth: int = int(os.getenv("RAG_HYBRID_DEPTH", "20"))
+    rag_rrf_k: int = int(os.getenv("RAG_RRF_K", "60"))
+    rag_prefilter_candidates: int = int(os.getenv("RAG_PREFILTER_CANDIDATES", "200"))
+
+    # Optional compact copy scanned by the flat backend: "none", "int8" or
+    # "binary"; the best top_k * rag_rescore_factor rows are then rescored
+    # at full precision.
+    rag_quantization: str = os.getenv("RAG_QUANTIZATION", "none")
+    rag_rescore_factor: int = int(os.getenv("RAG_RESCORE_FACTOR", "10"))
+
+    # Retrieval backend: "flat" (exact), "ivf" or "hnsw" (FAISS, approximate).
+    # nprobe / ef_search trade recall for latency at query time; see
+    # scripts/bench_ann.py.
+    rag_index_backend: str = os.getenv("RAG_INDEX_BACKEND", "flat")
+    rag_ivf_nlist: int = int(os.getenv("RAG_IVF_NLIST", "0"))  # 0 = 4*sqrt(num_docs)
+    rag_ivf_nprobe: int = int(os.getenv("RAG_IVF_NPROBE", "8"))
+    rag_hnsw_m: int = int(os.getenv("RAG_HNSW_M", "32"))
+    rag_hnsw_ef_construction: int = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "80"))
+    rag_hnsw_ef_search: int = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+
+    # LRU of normalized question -> query embedding (0 disables). With a
+    # path set (.npz), it is saved at exit and reloaded on startup.
+    rag_query_cache_size: int = int(os.getenv("RAG_QUERY_CACHE_SIZE", "2048"))
+    rag_query_cache_path: str = os.getenv("RAG_QUERY_CACHE_PATH", "")
+
+    # /chat with use_rag: retrieval gets rag_timeout_ms before the request
+    # falls back to no context; results are cached per normalized question.
+    # The top_k chunks are packed, best first and deduplicated, into what
+    # the llama context window leaves free (capped at rag_context_tokens
+    # when > 0).
+    rag_top_k: int = int(os.getenv("RAG_TOP_K", "5"))
+    rag_context_tokens: int = int(os.getenv("RAG_CONTEXT_TOKENS", "0"))
+
+    # Optional cross-encoder rerank: rag_rerank_candidates chunks are
+    # retrieved and rescored, and the best rag_top_k are packed. Reranking
+    # is skipped (retrieval order kept) once it runs past its budget.
+    rag_rerank: bool = os.getenv("RAG_RERANK", "0") == "1"
+    rag_rerank_model: str = os.getenv("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rag_rerank_candidates: int = int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+    rag_rerank_budget_ms: float = float(os.getenv("RAG_RERANK_BUDGET_MS", "150"))
+    rag_rerank_batch_size: int = int(os.getenv("RAG_RERANK_BATCH_SIZE", "16"))
+    rag_rerank_cache_size: int = int(os.getenv("RAG_RERANK_CACHE_SIZE", "4096"))
+    rag_timeout_ms: float = float(os.getenv("RAG_TIMEOUT_MS", "250"))
+    rag_result_cache_size: int = int(os.getenv("RAG_RESULT_CACHE_SIZE", "512"))
+
     # Eval results
     eval_results_path: Path = artifacts_dir / "eval" / "eval_results.json"
 
@@ -54,6 +132,58 @@ class ConfigClass:
     api_host: str = os.getenv("API_HOST", "127.0.0.1")
     api_port: int = int(os.getenv("API_PORT", "8000"))
 
+    # Inference scheduling: worker threads running llama.cpp, and how many
+    # requests may wait for a worker before /chat answers 429.
+    inference_workers: int = int(os.getenv("INFERENCE_WORKERS", "2"))
+    inference_queue_size: int = int(os.getenv("INFERENCE_QUEUE_SIZE", "8"))
+
+    # Continuous batching: decode up to llama_batch_sequences /chat requests
+    # together in one llama.cpp context (set INFERENCE_WORKERS at least as high).
+    llama_batching: bool = os.getenv("LLAMA_BATCHING", "0") == "1"
+    llama_batch_sequences: int = int(os.getenv("LLAMA_BATCH_SEQUENCES", "4"))
+
+    # Constrain finetuned answers with a GBNF grammar to the three-section
+    # tutor layout (those requests bypass the batching engine).
+    llama_grammar: bool = os.getenv("LLAMA_GRAMMAR", "0") == "1"
+
+    # Stop finetuned decoding once section 3's question is finished (or the
+    # model starts echoing the prompt) instead of running to max_tokens.
+    # Off by default: it drops whatever the model writes after that line.
+    llama_early_stop: bool = os.getenv("LLAMA_EARLY_STOP", "0") == "1"
+
+    # Speculative decoding with prompt-lookup drafts: up to llama_draft_tokens
+    # tokens continuing a repeated llama_draft_ngram-gram of the prompt are
+    # verified per eval. Greedy outputs are unchanged.
+    llama_speculative: bool = os.getenv("LLAMA_SPECULATIVE", "0") == "1"
+    llama_draft_tokens: int = int(os.getenv("LLAMA_DRAFT_TOKENS", "10"))
+    llama_draft_ngram: int = int(os.getenv("LLAMA_DRAFT_NGRAM", "2"))
+
+    # Answer cache for /chat. ANSWER_CACHE_SIZE=0 disables it; ANSWER_CACHE_DB
+    # adds a sqlite tier that survives restarts. With the deterministic flag
+    # set, only greedy (temperature 0) requests are cached.
+    answer_cache_size: int = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+    answer_cache_ttl_s: float = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+    answer_cache_db: str = os.getenv("ANSWER_CACHE_DB", "")
+    answer_cache_disk_size: int = int(os.getenv("ANSWER_CACHE_DISK_SIZE", "10000"))
+    answer_cache_deterministic: bool = os.getenv("ANSWER_CACHE_DETERMINISTIC", "1") == "1"
+
+    # Semantic answer cache: serve the answer of a previously seen paraphrase
+    # when question embeddings are at least this cosine-similar.
+    semantic_cache_enabled: bool = os.getenv("SEMANTIC_CACHE", "0") == "1"
+    semantic_cache_size: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+    semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+    # Precomputed FAQ answers (scripts/build_faq_index.py). /chat serves one
+    # when the question embedding is this similar to a known FAQ question
+    # and the entry was generated by the currently loaded weights.
+    faq_index_enabled: bool = os.getenv("FAQ_INDEX", "1") == "1"
+    faq_index_path: Path = Path(os.getenv("FAQ_INDEX_PATH", str(artifacts_dir / "faq_index")))
+    faq_questions_path: Path = Path(os.getenv("FAQ_QUESTIONS_PATH", str(data_dir / "faq" / "faq.jsonl")))
+    faq_threshold: float = float(os.getenv("FAQ_THRESHOLD", "0.9"))
+
+    # Shared secret for /admin endpoints (disabled when empty)
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+
     # Dataset configuration
     dataset_name: str = os.getenv("DATASET_NAME", "ai_tutor_demo_dataset")
     # You can later set this to a real HF dataset ID.
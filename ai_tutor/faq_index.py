@@ -0,0 +1,150 @@
+# ai_tutor/faq_index.py
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_tutor.answer_cache import normalize_question
+from ai_tutor.config import Config
+
+ENTRIES_FILE = "faq.json"
+EMBEDDINGS_FILE = "faq_embeddings.npy"
+
+
+def _default_embed(texts: Sequence[str]) -> np.ndarray:
+    # Imported lazily, like the semantic cache: only needed when an index exists
+    from ai_tutor.rag.query_cache import get_query_cache
+    from ai_tutor.rag.store import _get_embedder
+
+    model_name = Config.embedding_model_id
+    return get_query_cache().encode(_get_embedder(model_name), model_name, list(texts))
+
+
+class FAQIndex:
+    """
+    Precomputed answers for known questions, looked up by question embedding.
+
+    Built offline by scripts/build_faq_index.py. Every entry records the
+    fingerprint of the weights that generated it (see
+    llama_backend.model_fingerprint), and only entries whose fingerprint
+    matches the model currently serving the mode are ever returned.
+    """
+
+    def __init__(
+        self,
+        entries: List[dict],
+        vectors: np.ndarray,
+        embedding_model: str,
+        threshold: float = 0.9,
+        embed: Optional[Callable[[Sequence[str]], np.ndarray]] = None,
+    ):
+        self.entries = entries  # question, finetuned, answer, model_type, fingerprint
+        self.vectors = vectors
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self._embed = embed or _default_embed
+        self._finetuned = np.array([e["finetuned"] for e in entries], dtype=bool)
+        self._fingerprints = np.array([e["fingerprint"] for e in entries], dtype=object)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match(
+        self,
+        question: str,
+        use_finetuned: bool,
+        fingerprint: str,
+    ) -> Optional[Tuple[str, str, float]]:
+        """Return (answer, model_type, similarity) of the closest current entry, or None."""
+        rows = np.flatnonzero((self._finetuned == use_finetuned) & (self._fingerprints == fingerprint))
+        if rows.size == 0:
+            self._count(False)
+            return None
+
+        vec = np.asarray(self._embed([question])[0], dtype=np.float32)
+        sims = self.vectors[rows] @ (vec / (np.linalg.norm(vec) + 1e-8))
+        best = int(np.argmax(sims))
+        sim = float(sims[best])
+        if sim < self.threshold:
+            self._count(False)
+            return None
+
+        self._count(True)
+        entry = self.entries[int(rows[best])]
+        return entry["answer"], entry["model_type"], sim
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self.entries),
+                "threshold": self.threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+    def find(self, question: str, use_finetuned: bool, fingerprint: str) -> Optional[dict]:
+        """Exact (normalized) entry for a question, used to skip regeneration on rebuilds."""
+        key = normalize_question(question)
+        for entry in self.entries:
+            if (
+                entry["finetuned"] == use_finetuned
+                and entry["fingerprint"] == fingerprint
+                and normalize_question(entry["question"]) == key
+            ):
+                return entry
+        return None
+
+    def save(self, index_dir: Path) -> None:
+        index_dir.mkdir(parents=True, exist_ok=True)
+        with open(index_dir / f"{EMBEDDINGS_FILE}.tmp", "wb") as f:
+            np.save(f, self.vectors.astype(np.float32))
+        os.replace(index_dir / f"{EMBEDDINGS_FILE}.tmp", index_dir / EMBEDDINGS_FILE)
+
+        # Entries last: a reader never sees entries without their vectors
+        meta = {
+            "embedding_model": self.embedding_model,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "entries": self.entries,
+        }
+        tmp = index_dir / f"{ENTRIES_FILE}.tmp"
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, index_dir / ENTRIES_FILE)
+
+    @classmethod
+    def load(cls, index_dir: Path, threshold: float = 0.9) -> Optional["FAQIndex"]:
+        """Load a built index, or None if there is none (or it is unusable)."""
+        entries_file = index_dir / ENTRIES_FILE
+        if not entries_file.exists():
+            return None
+
+        meta = json.loads(entries_file.read_text(encoding="utf-8"))
+        vectors = np.load(index_dir / EMBEDDINGS_FILE)
+        if len(vectors) != len(meta["entries"]):
+            print(f"[FAQ WARNING] {index_dir} is inconsistent; rebuild it with scripts/build_faq_index.py.")
+            return None
+        if meta["embedding_model"] != Config.embedding_model_id:
+            print(
+                f"[FAQ WARNING] FAQ index embedded with '{meta['embedding_model']}', "
+                f"but Config.embedding_model_id is '{Config.embedding_model_id}'; ignoring it."
+            )
+            return None
+        return cls(meta["entries"], vectors, meta["embedding_model"], threshold)
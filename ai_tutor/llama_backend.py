@@ -2,65 +2,736 @@
 
 from __future__ import annotations
 
+from collections import OrderedDict, deque
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Generator, Iterator, Optional, Tuple
+import codecs
+import ctypes
+import hashlib
+import queue
 import re
+import threading
 
-from llama_cpp import Llama
+import numpy as np
+import llama_cpp
+from llama_cpp import Llama, LlamaGrammar
+from llama_cpp import _internals
+from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
 
-from .prompts import build_prompt
+from .config import Config
+from .prompts import Mode, build_prompt, build_prompt_prefix
 
 
 BASE_GGUF = Path("models/gguf/tinyllama-q4_0.gguf")
 LORA_GGUF = Path("models/lora_gguf/tinyllama-tutor-lora-q8_0.gguf")
 
+# Every *.gguf in the adapter directory is a servable adapter, named by its
+# file stem; finetuned requests without an explicit adapter use LORA_GGUF.
+LORA_DIR = Path(Config.lora_gguf_dir) if Config.lora_gguf_dir else LORA_GGUF.parent
+DEFAULT_ADAPTER = Config.lora_default_adapter or LORA_GGUF.stem
+
+# Context window of every llama.cpp context (prompt + answer)
+N_CTX = 1024
+LORA_SCALE = 1.0
+
+
+# -------------------------------------------------------------------
+# Speculative decoding
+# -------------------------------------------------------------------
+
+
+class PromptLookupDraft(LlamaPromptLookupDecoding):
+    """
+    Prompt-lookup drafting: continuations of the latest n-gram found earlier
+    in the prompt (code identifiers, definitions, RAG context) are proposed
+    as draft tokens and verified in one llama.cpp eval.
+
+    Also counts how many drafts the model accepted. llama-cpp-python calls
+    the draft model with the verified sequence so far, so its growth since
+    the previous call is the accepted drafts plus one sampled token.
+    """
+
+    def __init__(self, max_ngram_size: int = 2, num_pred_tokens: int = 10):
+        super().__init__(max_ngram_size=max_ngram_size, num_pred_tokens=num_pred_tokens)
+        self._lock = threading.Lock()
+        self._prev: np.ndarray = np.empty(0, dtype=np.intc)
+        self._pending = 0  # drafts proposed by the previous call
+        self._calls = 0
+        self._drafted = 0
+        self._accepted = 0
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        draft = super().__call__(input_ids, **kwargs)
+        with self._lock:
+            self._calls += 1
+            n_prev = len(self._prev)
+            # Only a continuation of the same generation verifies the last drafts
+            if self._pending and len(input_ids) > n_prev and np.array_equal(input_ids[:n_prev], self._prev):
+                self._drafted += self._pending
+                self._accepted += min(self._pending, len(input_ids) - n_prev - 1)
+            self._prev = np.array(input_ids, dtype=np.intc)
+            self._pending = len(draft)
+        return draft
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "draft_calls": self._calls,
+                "drafted": self._drafted,
+                "accepted": self._accepted,
+                "acceptance_rate": self._accepted / self._drafted if self._drafted else 0.0,
+            }
+
+
+# Draft model of the shared Llama (serial path only; the batching engine
+# samples its own tokens)
+prompt_lookup: Optional[PromptLookupDraft] = (
+    PromptLookupDraft(Config.llama_draft_ngram, Config.llama_draft_tokens)
+    if Config.llama_speculative
+    else None
+)
+
 
 # -------------------------------------------------------------------
 # Model loaders
 # -------------------------------------------------------------------
 
+# llama.cpp contexts are not thread-safe: loading is serialized by
+# _LOAD_LOCK and every completion runs under its model's lock.
+_LOAD_LOCK = threading.Lock()
+_MODEL_LOCKS: dict[int, threading.Lock] = {}
+
+
+def _model_lock(model: Llama) -> threading.Lock:
+    with _LOAD_LOCK:
+        return _MODEL_LOCKS.setdefault(id(model), threading.Lock())
+
 
-@lru_cache(maxsize=1)
 def get_base_model() -> Llama:
-    if not BASE_GGUF.exists():
-        raise RuntimeError(f"Base GGUF model not found at {BASE_GGUF}")
+    """The one llama.cpp model every mode and adapter runs on (see _select_adapter)."""
+    with _LOAD_LOCK:
+        return _load_base_model()
 
-    return Llama(
-        model_path=str(BASE_GGUF),
-        n_ctx=1024,
-        n_threads=2,
-        logits_all=False,
-        use_mmap=True,
-        use_mlock=False,
-        verbose=False,
-    )
+
+def get_finetuned_model(adapter: Optional[str] = None) -> Llama:
+    """Same shared model as get_base_model(); checks that `adapter` exists (loaded on first use)."""
+    adapter_registry.path(adapter or DEFAULT_ADAPTER)
+    return get_base_model()
 
 
 @lru_cache(maxsize=1)
-def get_finetuned_model() -> Llama:
+def _load_base_model() -> Llama:
     if not BASE_GGUF.exists():
         raise RuntimeError(f"Base GGUF model not found at {BASE_GGUF}")
-    if not LORA_GGUF.exists():
-        raise RuntimeError(f"LoRA GGUF adapter not found at {LORA_GGUF}")
 
     return Llama(
         model_path=str(BASE_GGUF),
-        lora_path=str(LORA_GGUF),
-        n_ctx=1024,
+        n_ctx=N_CTX,
         n_threads=2,
         logits_all=False,
         use_mmap=True,
         use_mlock=False,
+        # llama-cpp-python keeps logits for every position when drafting
+        draft_model=prompt_lookup,
         verbose=False,
     )
 
 
+def resolve_adapter(use_finetuned: bool, adapter: Optional[str]) -> Optional[str]:
+    """Adapter a request runs with: None for base mode, else the named or default adapter."""
+    if not use_finetuned:
+        return None
+    return adapter or DEFAULT_ADAPTER
+
+
+class AdapterRegistry:
+    """
+    LoRA adapters discovered in `directory`, loaded onto the shared model on
+    first use instead of one Llama (weights + context + KV cache) each.
+
+    At most `max_resident` adapters stay loaded; the least recently used one
+    is freed to make room. Adapters pinned by a batching engine are never
+    evicted, so with more pinned adapters than `max_resident` the limit is
+    exceeded (with a warning). Methods that load or free adapters need the
+    shared model's lock; the registry's own lock guards its bookkeeping.
+    """
+
+    def __init__(self, directory: Path, max_resident: int = 2):
+        self.directory = directory
+        self.max_resident = max(1, max_resident)
+        self._lock = threading.RLock()
+        self._resident: OrderedDict[str, llama_cpp.llama_adapter_lora_p] = OrderedDict()
+        self._pinned: set[str] = set()
+        self._loads = 0
+        self._evictions = 0
+
+    def names(self) -> list[str]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(p.stem for p in self.directory.glob("*.gguf"))
+
+    def path(self, name: str) -> Path:
+        path = self.directory / f"{name}.gguf"
+        if path.parent != self.directory or not path.exists():
+            raise RuntimeError(f"LoRA GGUF adapter not found at {path}")
+        return path
+
+    def get(self, model: Llama, name: str) -> llama_cpp.llama_adapter_lora_p:
+        with self._lock:
+            adapter = self._resident.get(name)
+            if adapter is not None:
+                self._resident.move_to_end(name)
+                return adapter
+
+            path = self.path(name)
+            while len(self._resident) >= self.max_resident:
+                victim = next((n for n in self._resident if n not in self._pinned), None)
+                if victim is None:
+                    print(
+                        f"[LLAMA WARNING] All {len(self._resident)} resident LoRA adapters are pinned; "
+                        f"loading '{name}' exceeds LORA_MAX_RESIDENT={self.max_resident}"
+                    )
+                    break
+                self._evict(model, victim)
+
+            print(f"[LLAMA] Loading LoRA adapter '{name}'")
+            adapter = llama_cpp.llama_adapter_lora_init(model._model.model, str(path).encode("utf-8"))
+            if adapter is None:
+                raise RuntimeError(f"Failed to load LoRA adapter from {path}")
+            self._resident[name] = adapter
+            self._loads += 1
+            return adapter
+
+    def pin(self, name: str) -> None:
+        with self._lock:
+            self._pinned.add(name)
+
+    def _evict(self, model: Llama, name: str) -> None:
+        with self._lock:
+            adapter = self._resident.pop(name)
+            if _ACTIVE_ADAPTER.get(id(model)) == name:
+                _select_adapter(model, None, adapter)
+            llama_cpp.llama_adapter_lora_free(adapter)
+            # Prefix KV states computed under the adapter go with it
+            for key in [k for k in _PREFIX_STATES if k[2] == name]:
+                del _PREFIX_STATES[key]
+            self._evictions += 1
+
+    def stats(self) -> dict:
+        available = self.names()
+        with self._lock:
+            return {
+                "available": available,
+                "resident": list(self._resident),
+                "pinned": sorted(self._pinned),
+                "max_resident": self.max_resident,
+                "loads": self._loads,
+                "evictions": self._evictions,
+            }
+
+
+adapter_registry = AdapterRegistry(LORA_DIR, Config.lora_max_resident)
+
+
+# Adapter currently applied to the shared model's own context (None = base)
+_ACTIVE_ADAPTER: dict[int, Optional[str]] = {}
+
+
+def _select_adapter(
+    model: Llama,
+    name: Optional[str],
+    current: Optional[llama_cpp.llama_adapter_lora_p] = None,
+) -> None:
+    """
+    Apply LoRA adapter `name` to the model's context (None = plain base
+    weights). KV cells computed under other weights are dropped on a
+    switch. Caller holds the model lock.
+    """
+    active = _ACTIVE_ADAPTER.get(id(model))
+    if active == name:
+        return
+
+    ctx = model._ctx.ctx
+    if active is not None:
+        llama_cpp.llama_rm_adapter_lora(ctx, current or adapter_registry.get(model, active))
+        _ACTIVE_ADAPTER[id(model)] = None
+    if name is not None:
+        if llama_cpp.llama_set_adapter_lora(ctx, adapter_registry.get(model, name), LORA_SCALE):
+            raise RuntimeError(f"Failed to set LoRA adapter '{name}'")
+
+    model._ctx.kv_cache_seq_rm(-1, -1, -1)
+    model.reset()
+    _ACTIVE_ADAPTER[id(model)] = name
+
+
+# Files larger than this (the base GGUF) are fingerprinted from their size
+# plus the first and last _DIGEST_SAMPLE bytes (GGUF header/metadata and the
+# final tensors), so a request never reads gigabytes; adapters are hashed whole.
+_FULL_DIGEST_LIMIT = 64 << 20
+_DIGEST_SAMPLE = 4 << 20
+
+
+@lru_cache(maxsize=None)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    h = hashlib.blake2b(str(size).encode("utf-8"), digest_size=8)
+    with open(path, "rb") as f:
+        if size > _FULL_DIGEST_LIMIT:
+            h.update(f.read(_DIGEST_SAMPLE))
+            f.seek(size - _DIGEST_SAMPLE)
+            h.update(f.read(_DIGEST_SAMPLE))
+        else:
+            while block := f.read(1 << 20):
+                h.update(block)
+    return h.hexdigest()
+
+
+def model_fingerprint(use_finetuned: bool, adapter: Optional[str] = None) -> str:
+    """
+    Content hash of the weights behind a mode (the base GGUF, plus the LoRA
+    adapter for finetuned). Precomputed answers are tagged with it. Hashed
+    once per file version (see _file_digest).
+    """
+    name = resolve_adapter(use_finetuned, adapter)
+    paths = [BASE_GGUF] if name is None else [BASE_GGUF, adapter_registry.path(name)]
+    digests = []
+    for path in paths:
+        st = path.stat()
+        digests.append(_file_digest(str(path), st.st_size, st.st_mtime_ns))
+    if use_finetuned and Config.llama_grammar:
+        # Grammar-constrained answers differ from free-running ones
+        digests.append("gbnf-" + hashlib.blake2b(_TUTOR_GBNF.encode("utf-8"), digest_size=4).hexdigest())
+    return "+".join(digests)
+
+
+# -------------------------------------------------------------------
+# Prompt-prefix KV cache
+# -------------------------------------------------------------------
+
+
+class _PrefixState:
+    """KV cells of a mode's static system prefix, copied out of sequence 0."""
+
+    def __init__(self, tokens: list[int], data: bytes):
+        self.tokens = tokens
+        self.data = data
+
+    def load_into(self, ctx: llama_cpp.llama_context_p, seq_id: int) -> bool:
+        src = (ctypes.c_uint8 * len(self.data)).from_buffer_copy(self.data)
+        return llama_cpp.llama_state_seq_set_data(ctx, src, len(self.data), seq_id) != 0
+
+
+# Keyed by (model, mode, adapter): the KV cells depend on the weights too
+_PREFIX_STATES: dict[tuple[int, str, Optional[str]], _PrefixState] = {}
+
+
+def _prompt_tokens(model: Llama, text: str) -> list[int]:
+    # Same tokenization create_completion applies to a prompt
+    return model.tokenize(text.encode("utf-8"), add_bos=True, special=True)
+
+
+def _prefix_state(model: Llama, mode: Mode, adapter: Optional[str]) -> _PrefixState:
+    """Prefill the system prefix of `mode` under `adapter` once and keep its KV cells. Caller holds the model lock."""
+    key = (id(model), mode, adapter)
+    state = _PREFIX_STATES.get(key)
+    if state is None:
+        tokens = _prompt_tokens(model, build_prompt_prefix(mode))
+        _select_adapter(model, adapter)
+        model.reset()
+        model.eval(tokens)
+
+        ctx = model._ctx.ctx
+        size = llama_cpp.llama_state_seq_get_size(ctx, 0)
+        buf = (ctypes.c_uint8 * size)()
+        n = llama_cpp.llama_state_seq_get_data(ctx, buf, size, 0)
+        state = _PrefixState(tokens, bytes(buf)[:n])
+        _PREFIX_STATES[key] = state
+    return state
+
+
+def _restore_prefix(model: Llama, mode: Mode, adapter: Optional[str]) -> None:
+    """
+    Make the KV cache of `model` start with the system prefix of `mode`.
+
+    create_completion already skips the longest common prefix between the
+    new prompt and the tokens in the cache, so with the prefix restored only
+    the question/context suffix is prefilled. Also switches the context to
+    `adapter` (None = base weights). Caller holds the model lock.
+    """
+    _select_adapter(model, adapter)
+    state = _prefix_state(model, mode, adapter)
+    n = len(state.tokens)
+    if model.n_tokens >= n and model.input_ids[:n].tolist() == state.tokens:
+        return
+
+    model._ctx.kv_cache_seq_rm(-1, -1, -1)
+    if not state.load_into(model._ctx.ctx, 0):
+        # Fall back to a full prefill inside create_completion
+        model.reset()
+        return
+    model.input_ids[:n] = state.tokens
+    model.n_tokens = n
+
+
+def warm_model(use_finetuned: bool, adapter: Optional[str] = None) -> None:
+    """
+    Load the model (and adapter) for a mode and prefill its system prefix, so
+    a request can do this while other per-request work (e.g. retrieval) is
+    in flight. Returns immediately once warm, without waiting on a busy model.
+    """
+    mode: Mode = "finetuned" if use_finetuned else "base"
+    name = resolve_adapter(use_finetuned, adapter)
+    model = get_finetuned_model(name) if use_finetuned else get_base_model()
+    if (id(model), mode, name) in _PREFIX_STATES:
+        return
+    with _model_lock(model):
+        _prefix_state(model, mode, name)
+
+
+def count_tokens(text: str) -> int:
+    """Number of llama tokens `text` adds to a prompt (no BOS); the same in every mode."""
+    model = get_base_model()
+    return len(model.tokenize(text.encode("utf-8"), add_bos=False, special=False))
+
+
+# Slack for tokens merging differently once the context is spliced in
+_CONTEXT_MARGIN = 8
+
+
+def context_budget(question: str, use_finetuned: bool = False, max_tokens: Optional[int] = None) -> int:
+    """
+    Tokens left for RAG context in the N_CTX window once the prompt for
+    `question` and `max_tokens` of answer are accounted for.
+    """
+    mode: Mode = "finetuned" if use_finetuned else "base"
+    model = get_base_model()
+    max_tokens = DEFAULT_MAX_TOKENS if max_tokens is None else max_tokens
+    # A one-space context still emits the reference-notes header
+    prompt = build_prompt(question=question, mode=mode, context=" ")
+    used = len(_prompt_tokens(model, prompt))
+    return max(0, model.n_ctx() - max_tokens - used - _CONTEXT_MARGIN)
+
+
+# -------------------------------------------------------------------
+# Continuous batching engine
+# -------------------------------------------------------------------
+
+
+def _sample_token(
+    logits: np.ndarray,
+    history: list[int],
+    rng: np.random.Generator,
+    temperature: float = 0.8,
+    top_p: float = 0.95,
+    repeat_penalty: float = 1.0,
+    top_k: int = 40,
+    min_p: float = 0.05,
+    repeat_last_n: int = 64,
+) -> int:
+    """Numpy port of llama-cpp-python's default sampler chain for one row of logits."""
+    logits = logits.astype(np.float32, copy=True)
+
+    if repeat_penalty != 1.0 and history:
+        recent = np.unique(np.asarray(history[-repeat_last_n:], dtype=np.int64))
+        vals = logits[recent]
+        logits[recent] = np.where(vals > 0, vals / repeat_penalty, vals * repeat_penalty)
+
+    if temperature <= 0:
+        return int(np.argmax(logits))
+
+    if 0 < top_k < logits.shape[0]:
+        candidates = np.argpartition(-logits, top_k)[:top_k]
+    else:
+        candidates = np.arange(logits.shape[0])
+    candidates = candidates[np.argsort(-logits[candidates])]
+
+    keep = _truncate_candidates(logits[candidates], top_p, min_p)
+
+    # Temperature comes last in the chain, after the top_p/min_p cutoffs
+    probs = np.exp((logits[candidates[:keep]] - logits[candidates[0]]) / temperature)
+    probs /= probs.sum()
+    return int(candidates[rng.choice(keep, p=probs)])
+
+
+def _truncate_candidates(sorted_logits: np.ndarray, top_p: float, min_p: float) -> int:
+    """How many of the (descending) candidates survive top_p then min_p, both on the temperature-1 softmax."""
+    probs = np.exp(sorted_logits - sorted_logits[0])
+    probs /= probs.sum()
+
+    keep = len(probs)
+    if top_p < 1.0:
+        keep = min(keep, int(np.searchsorted(np.cumsum(probs), top_p)) + 1)
+    if min_p > 0.0:
+        keep = min(keep, max(1, int(np.count_nonzero(probs[:keep] >= min_p * probs[0]))))
+    return keep
+
+
+class _BatchSequence:
+    """One request inside BatchEngine; iterating it yields decoded text pieces."""
+
+    def __init__(self, prompt: list[int], max_tokens: int, sampling: dict):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.sampling = sampling
+        self.seq_id = -1
+        self.n_past = 0  # tokens of this sequence already in the KV cache
+        self.generated: list[int] = []
+        self.cancelled = threading.Event()
+        self._pieces: queue.Queue = queue.Queue()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+    def _emit(self, data: bytes) -> None:
+        text = self._decoder.decode(data)
+        if text:
+            self._pieces.put(text)
+
+    def _close(self, error: Optional[BaseException] = None) -> None:
+        self._pieces.put(error)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            while True:
+                item = self._pieces.get()
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.cancelled.set()
+
+
+class BatchEngine:
+    """
+    Continuous batching over one llama.cpp context with per-sequence ids.
+
+    Each step decodes a single llama_batch holding the next token of every
+    running sequence plus prompt chunks for newly admitted ones. Requests join
+    between steps and are retired (their KV cells freed) as soon as they
+    finish, so concurrent /chat calls share decode steps instead of queuing
+    for the model one completion at a time.
+    """
+
+    def __init__(
+        self,
+        llama: Llama,
+        n_seq: int = 4,
+        n_ctx_per_seq: int = N_CTX,
+        n_batch: int = 512,
+        prefix: Optional[_PrefixState] = None,
+        lora_adapter: Optional[llama_cpp.llama_adapter_lora_p] = None,
+    ):
+        self.n_seq = n_seq
+        self.n_ctx_per_seq = n_ctx_per_seq
+        self.n_batch = n_batch
+        self._llama = llama
+        self._prefix = prefix
+
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = n_ctx_per_seq * n_seq
+        params.n_batch = n_batch
+        params.n_ubatch = n_batch
+        params.n_seq_max = n_seq
+        params.n_threads = llama.context_params.n_threads
+        params.n_threads_batch = llama.context_params.n_threads_batch
+
+        # Shares the already-loaded weights (and LoRA adapter) of `llama`
+        self._ctx = _internals.LlamaContext(model=llama._model, params=params, verbose=False)
+        if lora_adapter is not None:
+            if llama_cpp.llama_set_adapter_lora(self._ctx.ctx, lora_adapter, LORA_SCALE):
+                raise RuntimeError("Failed to set LoRA adapter on batch context")
+        self._batch = _internals.LlamaBatch(n_tokens=n_batch, embd=0, n_seq_max=1, verbose=False)
+
+        self._n_vocab = llama.n_vocab()
+        self._rng = np.random.default_rng()
+        self._free_ids = list(range(n_seq))
+        self._waiting: deque[_BatchSequence] = deque()
+        self._running: list[_BatchSequence] = []
+        self._cond = threading.Condition()
+
+        self._thread = threading.Thread(target=self._loop, name="llama-batch", daemon=True)
+        self._thread.start()
+
+    # ---------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------
+
+    def submit(self, prompt: str, max_tokens: int, sampling: dict) -> _BatchSequence:
+        tokens = self._llama.tokenize(prompt.encode("utf-8"), add_bos=True, special=True)
+        if len(tokens) >= self.n_ctx_per_seq:
+            raise ValueError(
+                f"Requested tokens ({len(tokens)}) exceed context window of {self.n_ctx_per_seq}"
+            )
+
+        seq = _BatchSequence(tokens, min(max_tokens, self.n_ctx_per_seq - len(tokens)), sampling)
+        with self._cond:
+            self._waiting.append(seq)
+            self._cond.notify()
+        return seq
+
+    def complete(self, prompt: str, max_tokens: int, sampling: dict) -> str:
+        return "".join(self.submit(prompt, max_tokens, sampling))
+
+    # ---------------------------------------------------------------
+    # Scheduling loop
+    # ---------------------------------------------------------------
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._running and not self._waiting:
+                    self._cond.wait()
+                # Admit new sequences between decode steps
+                while self._waiting and self._free_ids:
+                    seq = self._waiting.popleft()
+                    seq.seq_id = self._free_ids.pop()
+                    self._running.append(seq)
+                    self._reuse_prefix(seq)
+
+            try:
+                self._step()
+            except Exception as exc:
+                for seq in list(self._running):
+                    self._retire(seq, exc)
+
+    def _reuse_prefix(self, seq: _BatchSequence) -> None:
+        """Copy the cached system-prefix KV cells into a new sequence."""
+        prefix = self._prefix
+        if prefix is None or seq.prompt[: len(prefix.tokens)] != prefix.tokens:
+            return
+        if len(seq.prompt) > len(prefix.tokens) and prefix.load_into(self._ctx.ctx, seq.seq_id):
+            seq.n_past = len(prefix.tokens)
+
+    def _step(self) -> None:
+        batch = self._batch.batch
+        n = 0
+        sample_at: list[tuple[_BatchSequence, int]] = []
+
+        def add(token: int, pos: int, seq_id: int, logits: bool) -> None:
+            nonlocal n
+            batch.token[n] = token
+            batch.pos[n] = pos
+            batch.seq_id[n][0] = seq_id
+            batch.n_seq_id[n] = 1
+            batch.logits[n] = logits
+            n += 1
+
+        for seq in list(self._running):
+            if seq.cancelled.is_set():
+                self._retire(seq)
+
+        # Running sequences first, so a long prompt never stalls their decoding
+        for seq in self._running:
+            if seq.n_past >= len(seq.prompt):
+                add(seq.generated[-1], seq.n_past, seq.seq_id, True)
+                sample_at.append((seq, n - 1))
+                seq.n_past += 1
+
+        # Fill the rest of the batch with prompt chunks (chunked prefill)
+        for seq in self._running:
+            remaining = len(seq.prompt) - seq.n_past
+            if remaining <= 0 or n >= self.n_batch:
+                continue
+            take = min(remaining, self.n_batch - n)
+            for i in range(take):
+                pos = seq.n_past + i
+                last = pos == len(seq.prompt) - 1
+                add(seq.prompt[pos], pos, seq.seq_id, last)
+                if last:
+                    sample_at.append((seq, n - 1))
+            seq.n_past += take
+
+        if n == 0:
+            return
+        batch.n_tokens = n
+        self._ctx.decode(self._batch)
+
+        for seq, idx in sample_at:
+            logits = np.ctypeslib.as_array(self._ctx.get_logits_ith(idx), shape=(self._n_vocab,))
+            token = _sample_token(logits, seq.prompt + seq.generated, self._rng, **seq.sampling)
+
+            if llama_cpp.llama_token_is_eog(self._llama._model.vocab, token):
+                self._retire(seq)
+                continue
+
+            seq.generated.append(token)
+            seq._emit(self._llama._model.token_to_piece(token))
+
+            if len(seq.generated) >= seq.max_tokens:
+                self._retire(seq)
+
+    def _retire(self, seq: _BatchSequence, error: Optional[BaseException] = None) -> None:
+        if seq in self._running:
+            self._running.remove(seq)
+            self._ctx.kv_cache_seq_rm(seq.seq_id, -1, -1)
+            with self._cond:
+                self._free_ids.append(seq.seq_id)
+        seq._close(error)
+
+
+# Keyed by adapter name (None = base mode)
+_ENGINES: dict[Optional[str], BatchEngine] = {}
+
+
+def get_batch_engine(use_finetuned: bool, adapter: Optional[str] = None) -> BatchEngine:
+    """Lazily build one BatchEngine (own context) per adapter on top of the shared weights."""
+    name = resolve_adapter(use_finetuned, adapter)
+    model = get_finetuned_model(name) if use_finetuned else get_base_model()
+    with _model_lock(model):
+        prefix = _prefix_state(model, "finetuned" if use_finetuned else "base", name)
+        lora = None
+        if name is not None:
+            # The engine's context keeps using the adapter, so it stays loaded
+            lora = adapter_registry.get(model, name)
+            adapter_registry.pin(name)
+    with _LOAD_LOCK:
+        if name not in _ENGINES:
+            _ENGINES[name] = BatchEngine(
+                model,
+                n_seq=Config.llama_batch_sequences,
+                prefix=prefix,
+                lora_adapter=lora,
+            )
+        return _ENGINES[name]
+
+
 # -------------------------------------------------------------------
 # Finetuned cleaning + restructuring ONLY
 # -------------------------------------------------------------------
 
 
+_META_PHRASES = [
+    "<<USER>>",
+    "<<SYS>>",
+    "<</SYS>>",
+    "[/SYS]",
+    "[INST]",
+    "[/INST]",
+    "Tutor answer:",
+    "Student answer:",
+    "Tutor question:",
+    # Old training headers that sometimes get echoed
+    "Always answer the same three clear questions in exactly three numbers.",
+    "Use plain language that students can understand without Google.",
+    "Always use plain language that students can understand without Google.",
+    "appropriate for a first programming course.",
+    "Talk directly to the student and avoid using emojis or abbreviations.",
+    "Talk directly to the student and keep paragraphs short.",
+    "clear student example",
+]
+
+_SECTION_HEADINGS = [
+    "Core Idea",
+    "Step-by-Step Example",
+    "Common Mistake + Check-Your-Understanding Question",
+]
+
+_CHECK_QUESTION = (
+    "Check-your-understanding question: "
+    "In your own words, why is this concept important in programming?"
+)
+
+
 def _strip_meta(text: str) -> str:
     """Remove obvious prompt-echo junk from the finetuned output."""
     t = text.strip()
@@ -70,27 +741,7 @@ def _strip_meta(text: str) -> str:
     if sq_idx != -1:
         t = t[:sq_idx].strip()
 
-    remove_anywhere = [
-        "<<USER>>",
-        "<<SYS>>",
-        "<</SYS>>",
-        "[/SYS]",
-        "[INST]",
-        "[/INST]",
-        "Tutor answer:",
-        "Student answer:",
-        "Tutor question:",
-        # Old training headers that sometimes get echoed
-        "Always answer the same three clear questions in exactly three numbers.",
-        "Use plain language that students can understand without Google.",
-        "Always use plain language that students can understand without Google.",
-        "appropriate for a first programming course.",
-        "Talk directly to the student and avoid using emojis or abbreviations.",
-        "Talk directly to the student and keep paragraphs short.",
-        "clear student example",
-    ]
-
-    for phrase in remove_anywhere:
+    for phrase in _META_PHRASES:
         t = t.replace(phrase, "").strip()
 
     # Remove empty lines
@@ -121,32 +772,66 @@ def _split_numbered_sections(text: str) -> list[str]:
     return sections
 
 
-def _restructure_finetuned(text: str) -> str:
-    """
-    Take the model's cleaned finetuned text and reshape it into:
+# GBNF for the finetuned answer: the three headings in order, a few lines
+# per section, and section 3 ending on its check-your-understanding
+# question, where the grammar (and so generation) ends. Lines may not start
+# with a section number, "[" or "<", which rules out extra sections and
+# [INST]/<<SYS>> echoes. Echoes like "Student question:" still fit, so the
+# output goes through _clean_grammar_output.
+_TUTOR_GBNF = rf"""
+root     ::= "1. {_SECTION_HEADINGS[0]}\n" body "\n"? "2. {_SECTION_HEADINGS[1]}\n" body "\n"? "3. {_SECTION_HEADINGS[2]}\n" (line "\n"?){{0,4}} question
+body     ::= line ("\n"? line){{0,7}}
+line     ::= text "\n"
+text     ::= start [^\n]*
+question ::= start [^\n?]* "?"
+start    ::= [^\n0-9\[<] | [0-9]+ [^.\n0-9]
+"""
 
-    1. Core Idea
-    ...
-    2. Step-by-Step Example
-    ...
-    3. Common Mistake + Check-Your-Understanding Question
+
+@lru_cache(maxsize=1)
+def tutor_grammar() -> LlamaGrammar:
+    return LlamaGrammar.from_string(_TUTOR_GBNF, verbose=False)
+
+
+def _grammar_for(use_finetuned: bool) -> Optional[LlamaGrammar]:
+    return tutor_grammar() if use_finetuned and Config.llama_grammar else None
+
+
+def _clean_grammar_output(text: str) -> str:
     """
-    cleaned = text.strip()
-    if not cleaned:
-        return cleaned
+    _strip_meta for grammar output, which is already laid out: cut at a
+    "Student question:" echo and remove meta phrases, but keep the headings
+    and blank lines. Lines that held only a meta phrase are dropped.
+    """
+    sq_idx = text.lower().find("student question:")
+    if sq_idx != -1:
+        text = text[:sq_idx]
 
-    sections = _split_numbered_sections(cleaned)
+    lines = []
+    for line in text.splitlines():
+        cleaned = line
+        for phrase in _META_PHRASES:
+            cleaned = cleaned.replace(phrase, "")
+        if line.strip() and not cleaned.strip():
+            continue
+        lines.append(cleaned.strip())
+    return "\n".join(lines).strip()
 
-    # If we didn't get at least 2 sections, just return cleaned text
-    if len(sections) < 2:
-        return cleaned
 
-    headings = [
-        "Core Idea",
-        "Step-by-Step Example",
-        "Common Mistake + Check-Your-Understanding Question",
-    ]
+def _finalize_grammar(raw_text: str) -> str:
+    """Grammar-constrained finetuned answer as /chat returns it."""
+    return _clean_grammar_output(raw_text) or _finalize_finetuned("")
+
 
+_CHECK_ANSWER_RE = re.compile(r"\s+Check your answer by comparing.*?$", flags=re.IGNORECASE | re.DOTALL)
+
+
+def _format_sections(sections: list[str], complete: bool = True) -> str:
+    """
+    Sections 1-3 under their headings, joined by blank lines. With
+    complete=False the last section may still grow, so section 3 does not
+    get _CHECK_QUESTION yet.
+    """
     formatted_parts: list[str] = []
 
     for idx in range(min(3, len(sections))):
@@ -159,32 +844,262 @@ def _restructure_finetuned(text: str) -> str:
         body = "\n".join(lines).strip()
 
         # For section 3, ensure there's at least one question
-        if idx == 2 and body and "?" not in body:
-            body = (
-                body
-                + "\n\nCheck-your-understanding question: "
-                  "In your own words, why is this concept important in programming?"
-            ).strip()
+        if idx == 2 and complete and body and "?" not in body:
+            body = (body + "\n\n" + _CHECK_QUESTION).strip()
 
         if not body:
             continue
 
-        heading = headings[idx]
+        heading = _SECTION_HEADINGS[idx]
         formatted_parts.append(f"{idx + 1}. {heading}\n{body}")
 
-    if not formatted_parts:
+    return "\n\n".join(formatted_parts).strip()
+
+
+def _collapse_spaces(text: str) -> str:
+    while "  " in text:
+        text = text.replace("  ", " ")
+    return text
+
+
+def _restructure_finetuned(text: str) -> str:
+    """
+    Take the model's cleaned finetuned text and reshape it into:
+
+    1. Core Idea
+    ...
+    2. Step-by-Step Example
+    ...
+    3. Common Mistake + Check-Your-Understanding Question
+    """
+    cleaned = text.strip()
+    if not cleaned:
+        return cleaned
+
+    sections = _split_numbered_sections(cleaned)
+
+    # If we didn't get at least 2 sections, just return cleaned text
+    if len(sections) < 2:
         return cleaned
 
-    result = "\n\n".join(formatted_parts).strip()
+    result = _format_sections(sections)
+    if not result:
+        return cleaned
 
     # Clean up any leftover weird trailing fragments like half-sentences
-    result = re.sub(r"\s+Check your answer by comparing.*?$", "", result, flags=re.IGNORECASE | re.DOTALL).strip()
+    result = _CHECK_ANSWER_RE.sub("", result).strip()
 
     # Normalize double spaces
-    while "  " in result:
-        result = result.replace("  ", " ")
+    return _collapse_spaces(result)
+
+
+def _finalize_finetuned(raw_text: str) -> str:
+    """Finetuned answer as /chat returns it: cleanup + 1/2/3 restructuring, with fallbacks."""
+    if not raw_text.strip():
+        # Fallback if llama gives literally nothing
+        raw_text = _FINETUNED_FALLBACK
+
+    cleaned = _strip_meta(raw_text)
+    structured = _restructure_finetuned(cleaned)
+    if not structured.strip():
+        structured = cleaned or raw_text
+
+    return structured.strip()
+
+
+class _FinetunedStreamCleaner:
+    """
+    Incremental version of _finalize_finetuned.
+
+    Raw tokens go in through feed(). Each call re-runs the cleanup on the
+    text so far, minus a tail that could still turn into a meta phrase, a
+    cut marker or a section number, and releases the part of the result
+    that later tokens can no longer change. Nothing is released before a
+    second section appears (with fewer, the text is returned unrestructured).
+    finish() releases the rest of _finalize_finetuned(raw), so the streamed
+    answer is always the one /chat returns.
+    """
+
+    _CUT_MARKERS = ("student question:", "check your answer by comparing")
+    _HOLD = max(len(p) for p in [*_META_PHRASES, *_CUT_MARKERS])
+
+    def __init__(self) -> None:
+        self._raw = ""
+        self._emitted = ""
+        self.done = False  # the rest of the generation cannot change the answer
+
+    def feed(self, piece: str) -> str:
+        if self.done:
+            return ""
+        self._raw += piece
+        return self._release(self._stable_output())
+
+    def finish(self) -> str:
+        self.done = True
+        final = self._finalize(self._raw)
+        if not final.startswith(self._emitted):
+            print("[LLAMA WARNING] Streamed finetuned answer diverged from the final cleanup")
+            return ""
+        return self._release(final)
+
+    def _finalize(self, raw: str) -> str:
+        return _finalize_finetuned(raw)
+
+    def _release(self, text: str) -> str:
+        if len(text) <= len(self._emitted) or not text.startswith(self._emitted):
+            return ""
+        out = text[len(self._emitted):]
+        self._emitted = text
+        return out
+
+    def _stable_output(self) -> str:
+        raw = self._raw
+        if "student question:" in raw.lower():
+            # _strip_meta drops everything from here on (unless that leaves
+            # nothing, when _finalize_finetuned falls back to the raw text)
+            self.done = bool(_strip_meta(raw))
+            return ""
+
+        cleaned = _strip_meta(raw[: self._safe_length(raw)])
+        cleaned = cleaned[: self._safe_length(cleaned)]
+        # Trailing numbers may still become "2. " section markers
+        cleaned = re.sub(r"(?:\d+\.?\s*)+$", "", cleaned).rstrip()
+
+        sections = _split_numbered_sections(cleaned)
+        if len(sections) < 2:
+            return ""
+        if len(sections) > len(_SECTION_HEADINGS):
+            # Sections 1-3 are complete; the rest is dropped (unless they are
+            # all empty, when the whole cleaned text is returned)
+            self.done = bool(_format_sections(sections))
+            return ""
+
+        result = _format_sections(sections, complete=False)
+        m = _CHECK_ANSWER_RE.search(result)
+        if m:
+            # Everything from here on is dropped
+            self.done = True
+            return ""
+
+        result = result[: self._safe_length(result)].rstrip()
+        return _collapse_spaces(result)
+
+    def _safe_length(self, text: str) -> int:
+        """Length of the prefix of `text` no later token can turn into a meta phrase or cut marker."""
+        for start in range(max(0, len(text) - self._HOLD), len(text)):
+            tail = text[start:]
+            low = tail.lower()
+            if any(p.startswith(tail) for p in _META_PHRASES) or any(
+                m.startswith(low) for m in self._CUT_MARKERS
+            ):
+                return start
+        return len(text)
+
+
+class _GrammarStreamCleaner(_FinetunedStreamCleaner):
+    """Incremental _finalize_grammar: releases the cleaned output line by line."""
+
+    def _finalize(self, raw: str) -> str:
+        return _finalize_grammar(raw)
+
+    def _stable_output(self) -> str:
+        raw = self._raw
+        if "student question:" in raw.lower():
+            # Everything from here on is cut (unless nothing is left before it)
+            self.done = bool(_clean_grammar_output(raw))
+            return ""
+        # Only complete lines; the last one may still grow
+        return _clean_grammar_output(raw[: raw.rfind("\n") + 1])
+
+
+class _StructureStop:
+    """
+    Stop criterion for finetuned generation, fed the raw text as it streams.
+
+    Fires at a prompt echo or a fourth numbered section, whose text the
+    cleanup would drop anyway, and once section 3 has finished the line
+    with its check-your-understanding question.
+    """
+
+    _SECTION_RE = re.compile(r"(\d+)\.\s+")
+    _QUESTION_END_RE = re.compile(r"\?[ \t]*\n")
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.reason: Optional[str] = None
+
+    @property
+    def stopped(self) -> bool:
+        return self.reason is not None
+
+    def feed(self, piece: str) -> str:
+        """Add a raw piece; returns the part of it before the stop point."""
+        start = len(self.text)
+        if self.reason is None:
+            self.text += piece
+            self.reason, end = self._check()
+            self.text = self.text[:end]
+        return self.text[start:]
+
+    def _check(self) -> Tuple[Optional[str], int]:
+        lower = self.text.lower()
+        if any(marker in lower for marker in _FinetunedStreamCleaner._CUT_MARKERS):
+            return "prompt echo", len(self.text)
+
+        sections = list(self._SECTION_RE.finditer(self.text))
+        if len(sections) > len(_SECTION_HEADINGS):
+            return "extra section", len(self.text)
+        if len(sections) == len(_SECTION_HEADINGS):
+            m = self._QUESTION_END_RE.search(self.text, sections[-1].end())
+            if m:
+                return "section 3 complete", m.end()
+        return None, len(self.text)
+
 
-    return result
+class EarlyStopStats:
+    """Counts finetuned generations cut short by _StructureStop."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._stopped = 0
+        self._tokens_saved = 0
+        self._reasons: dict[str, int] = {}
+
+    def record(self, stop: _StructureStop, max_tokens: int) -> None:
+        saved = 0
+        if stop.stopped:
+            generated = count_tokens(stop.text)
+            # Budget left unspent; the model might have ended on </s> before it
+            saved = max(0, max_tokens - generated)
+            print(f"[LLAMA] Early stop ({stop.reason}) after {generated} tokens, {saved} saved")
+
+        with self._lock:
+            self._requests += 1
+            if stop.stopped:
+                self._stopped += 1
+                self._tokens_saved += saved
+                self._reasons[stop.reason] = self._reasons.get(stop.reason, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": Config.llama_early_stop,
+                "requests": self._requests,
+                "stopped": self._stopped,
+                "tokens_saved": self._tokens_saved,
+                "reasons": dict(self._reasons),
+            }
+
+
+early_stop_stats = EarlyStopStats()
+
+
+def _structure_stop_for(use_finetuned: bool) -> Optional[_StructureStop]:
+    # Grammar-constrained output already ends with section 3
+    if not use_finetuned or not Config.llama_early_stop or Config.llama_grammar:
+        return None
+    return _StructureStop()
 
 
 # -------------------------------------------------------------------
@@ -192,73 +1107,250 @@ def _restructure_finetuned(text: str) -> str:
 # -------------------------------------------------------------------
 
 
+DEFAULT_MAX_TOKENS = 384
+
+_FINETUNED_SAMPLING = dict(temperature=0.5, top_p=0.9, repeat_penalty=1.1)
+_BASE_SAMPLING = dict(temperature=0.7, top_p=0.9, repeat_penalty=1.1)
+
+
+def sampling_params(use_finetuned: bool, temperature: Optional[float] = None) -> dict:
+    """Sampling settings for a mode; `temperature` overrides the mode default (0 = greedy)."""
+    params = dict(_FINETUNED_SAMPLING if use_finetuned else _BASE_SAMPLING)
+    if temperature is not None:
+        params["temperature"] = temperature
+    return params
+
+
+_FINETUNED_FALLBACK = (
+    "1. Core Idea\n"
+    "I’m sorry, I had trouble generating a detailed answer.\n\n"
+    "2. Step-by-Step Example\n"
+    "Try asking the question in a slightly different way.\n\n"
+    "3. Common Mistake + Check-Your-Understanding Question\n"
+    "A common issue is giving too little context. What extra detail "
+    "about your question could you add?"
+)
+
+_BASE_FALLBACK = (
+    "A loop is a programming construct that repeats a block of code while a "
+    "condition remains true, or for each item in a sequence."
+)
+
+
+def _complete(
+    use_finetuned: bool,
+    prompt: str,
+    max_tokens: int,
+    sampling: dict,
+    adapter: Optional[str] = None,
+) -> str:
+    """Run one completion, through the batching engine when it is enabled."""
+    grammar = _grammar_for(use_finetuned)
+    # The engine's numpy sampler cannot apply a grammar; such requests run serially
+    if Config.llama_batching and grammar is None:
+        return get_batch_engine(use_finetuned, adapter).complete(prompt, max_tokens, sampling)
+
+    name = resolve_adapter(use_finetuned, adapter)
+    model = get_finetuned_model(name) if use_finetuned else get_base_model()
+    with _model_lock(model):
+        _restore_prefix(model, "finetuned" if use_finetuned else "base", name)
+        output = model(
+            prompt,
+            max_tokens=max_tokens,
+            stop=["</s>"],  # avoid [/INST] early cutoffs
+            echo=False,
+            grammar=grammar,
+            **sampling,
+        )
+    return output["choices"][0]["text"] or ""
+
+
+def _complete_until(
+    stop: _StructureStop,
+    prompt: str,
+    max_tokens: int,
+    sampling: dict,
+    adapter: Optional[str] = None,
+) -> str:
+    """Finetuned completion, streamed so decoding ends as soon as `stop` fires."""
+    pieces = _stream_tokens(True, prompt, max_tokens, sampling, adapter)
+    try:
+        for piece in pieces:
+            stop.feed(piece)
+            if stop.stopped:
+                break
+    finally:
+        # Cancels the rest of the decode and releases the model lock
+        pieces.close()
+        early_stop_stats.record(stop, max_tokens)
+
+    return stop.text
+
+
 def generate_answer(
     question: str,
     use_finetuned: bool = False,
     context: Optional[str] = None,
-    max_tokens: int = 384,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: Optional[float] = None,
+    adapter: Optional[str] = None,
 ) -> Tuple[str, str]:
     """
     Core generation entry point used by the FastAPI /chat endpoint.
 
-    - Finetuned: structured tutor prompt + cleanup + 1/2/3 restructuring.
+    - Finetuned: structured tutor prompt + cleanup + 1/2/3 restructuring,
+      with LoRA `adapter` (default: DEFAULT_ADAPTER). Decoding stops once
+      section 3 is complete (see _StructureStop).
     - Base: very simple Q&A prompt, no cleanup or constraints.
     """
+    sampling = sampling_params(use_finetuned, temperature)
 
     if use_finetuned:
         # ---------- FINETUNED PATH ----------
-        model = get_finetuned_model()
         prompt = build_prompt(question=question, mode="finetuned", context=context)
+        stop = _structure_stop_for(True)
+        if stop is not None:
+            raw_text = _complete_until(stop, prompt, max_tokens, sampling, adapter)
+        else:
+            raw_text = _complete(True, prompt, max_tokens, sampling, adapter)
+        if Config.llama_grammar:
+            # Already in the three-section layout; only echoes are removed
+            return _finalize_grammar(raw_text), "finetuned-llama-lora"
 
-        output = model(
+        return _finalize_finetuned(raw_text), "finetuned-llama-lora"
+
+    # ---------- BASE PATH (simple completion via shared prompt builder) ----------
+    base_prompt = build_prompt(question=question, mode="base", context=context)
+    raw_text = _complete(False, base_prompt, max_tokens, sampling)
+
+    if not raw_text.strip():
+        raw_text = _BASE_FALLBACK
+
+    return raw_text.strip(), "base-llama"
+
+
+# -------------------------------------------------------------------
+# Streaming generation
+# -------------------------------------------------------------------
+
+
+def _stream_tokens(
+    use_finetuned: bool,
+    prompt: str,
+    max_tokens: int,
+    sampling: dict,
+    adapter: Optional[str] = None,
+) -> Generator[str, None, None]:
+    """
+    Yield raw text pieces from llama.cpp's stream=True completion generator
+    (or from the batching engine when it is enabled).
+
+    The model lock is held until the generator is exhausted or closed.
+    """
+    grammar = _grammar_for(use_finetuned)
+    if Config.llama_batching and grammar is None:
+        seq = get_batch_engine(use_finetuned, adapter).submit(prompt, max_tokens, sampling)
+        yield from seq
+        return
+
+    name = resolve_adapter(use_finetuned, adapter)
+    model = get_finetuned_model(name) if use_finetuned else get_base_model()
+    with _model_lock(model):
+        _restore_prefix(model, "finetuned" if use_finetuned else "base", name)
+        for chunk in model(
             prompt,
             max_tokens=max_tokens,
-            temperature=0.5,
-            top_p=0.9,
-            repeat_penalty=1.1,
-            stop=["</s>"],  # avoid [/INST] early cutoffs
-            echo=False,
-        )
+            stop=["</s>"],
+            stream=True,
+            grammar=grammar,
+            **sampling,
+        ):
+            text = chunk["choices"][0]["text"]
+            if text:
+                yield text
 
-        raw_text = output["choices"][0]["text"] or ""
-        if not raw_text.strip():
-            # Fallback if llama gives literally nothing
-            raw_text = (
-                "1. Core Idea\n"
-                "I’m sorry, I had trouble generating a detailed answer.\n\n"
-                "2. Step-by-Step Example\n"
-                "Try asking the question in a slightly different way.\n\n"
-                "3. Common Mistake + Check-Your-Understanding Question\n"
-                "A common issue is giving too little context. What extra detail "
-                "about your question could you add?"
-            )
 
-        cleaned = _strip_meta(raw_text)
-        structured = _restructure_finetuned(cleaned)
-        if not structured.strip():
-            structured = cleaned or raw_text
+def _clean_finetuned_stream(
+    pieces: Generator[str, None, None],
+    stop: Optional[_StructureStop] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    cleaner: Optional[_FinetunedStreamCleaner] = None,
+) -> Iterator[str]:
+    cleaner = cleaner or _FinetunedStreamCleaner()
 
-        return structured.strip(), "finetuned-llama-lora"
+    try:
+        for piece in pieces:
+            if stop is not None:
+                piece = stop.feed(piece)
+            out = cleaner.feed(piece)
+            if out:
+                yield out
+            if cleaner.done or (stop is not None and stop.stopped):
+                # Everything after a prompt echo / section 3 would be thrown away
+                break
+    finally:
+        # Stops llama.cpp decoding and releases the model lock right away.
+        # Also runs when the consumer closes the stream early.
+        pieces.close()
+        if stop is not None:
+            early_stop_stats.record(stop, max_tokens)
 
-    # ---------- BASE PATH (simple completion via shared prompt builder) ----------
-    model = get_base_model()
-    base_prompt = build_prompt(question=question, mode="base", context=context)
+    # The rest of the final answer, or all of it (e.g. the fallback)
+    out = cleaner.finish()
+    if out:
+        yield out
 
-    output = model(
-        base_prompt,
-        max_tokens=max_tokens,
-        temperature=0.7,
-        top_p=0.9,
-        repeat_penalty=1.1,
-        stop=["</s>"],
-    )
 
-    raw_text = output["choices"][0]["text"] or ""
+def _clean_base_stream(pieces: Generator[str, None, None], fallback: str = _BASE_FALLBACK) -> Iterator[str]:
+    # Mirror raw_text.strip(): drop leading whitespace, hold trailing whitespace
+    held = ""
+    emitted = False
 
-    if not raw_text.strip():
-        raw_text = (
-            "A loop is a programming construct that repeats a block of code while a "
-            "condition remains true, or for each item in a sequence."
-        )
+    try:
+        for piece in pieces:
+            text = held + piece
+            if not emitted:
+                text = text.lstrip()
+            body = text.rstrip()
+            held = text[len(body):]
+            if body:
+                emitted = True
+                yield body
+    finally:
+        pieces.close()
 
-    return raw_text.strip(), "base-llama"
+    if not emitted:
+        yield fallback
+
+
+def stream_answer(
+    question: str,
+    use_finetuned: bool = False,
+    context: Optional[str] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: Optional[float] = None,
+    adapter: Optional[str] = None,
+) -> Tuple[Iterator[str], str]:
+    """
+    Streaming counterpart of generate_answer used by POST /chat/stream.
+
+    Returns (chunks, model_type). The model is loaded by this call, before
+    any chunk is produced (the endpoint warms it up before the response
+    starts); chunks are produced lazily as llama.cpp decodes, with the
+    finetuned cleanup applied incrementally.
+    """
+    sampling = sampling_params(use_finetuned, temperature)
+
+    if use_finetuned:
+        get_finetuned_model(adapter)
+        prompt = build_prompt(question=question, mode="finetuned", context=context)
+        pieces = _stream_tokens(True, prompt, max_tokens, sampling, adapter)
+        if Config.llama_grammar:
+            return _clean_finetuned_stream(pieces, cleaner=_GrammarStreamCleaner()), "finetuned-llama-lora"
+        stop = _structure_stop_for(True)
+        return _clean_finetuned_stream(pieces, stop, max_tokens), "finetuned-llama-lora"
+
+    get_base_model()
+    base_prompt = build_prompt(question=question, mode="base", context=context)
+    pieces = _stream_tokens(False, base_prompt, max_tokens, sampling)
+    return _clean_base_stream(pieces), "base-llama"
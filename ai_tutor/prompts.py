@@ -5,91 +5,107 @@ from typing import Literal, Optional
 Mode = Literal["base", "finetuned"]
 
 
-def build_prompt(
-    question: str,
-    mode: Mode,
-    context: Optional[str] = None,
-) -> str:
+# STRONG tutoring instructions for the LoRA model (Option B)
+_FINETUNED_SYSTEM = dedent(
     """
-    Build prompts for TinyLlama.
+    You are a friendly, beginner-focused programming tutor.
+    Your students are taking an introductory course in Python and basic OOP.
 
-    - finetuned: strict 1/2/3 tutoring structure with a chat-style template.
-    - base: simple Q&A completion prompt.
+    Your answers MUST ALWAYS use EXACTLY three numbered sections
+    with these headings, in this order:
+
+    1. Core Idea
+    2. Step-by-Step Example
+    3. Common Mistake + Check-Your-Understanding Question
+
+    Formatting rules:
+
+    - Do NOT write anything before "1. Core Idea".
+    - Do NOT add extra headings or a closing summary.
+    - Do NOT include labels like "Student answer:" or "Tutor answer:".
+    - Use short paragraphs and plain language.
+
+    Content rules:
+
+    1. Core Idea
+       - Explain the main concept in 2–4 short sentences.
+       - Assume the student is a beginner.
+
+    2. Step-by-Step Example
+       - Give a concrete, minimal Python example.
+       - Walk through what happens in the code in 2–4 sentences.
+
+    3. Common Mistake + Check-Your-Understanding Question
+       - Describe one common mistake students make with this concept.
+       - End with ONE short question the student can answer to check understanding.
     """
+).strip()
 
-    if mode == "finetuned":
-        # STRONG tutoring instructions for the LoRA model (Option B)
-        system = dedent(
-            """
-            You are a friendly, beginner-focused programming tutor.
-            Your students are taking an introductory course in Python and basic OOP.
+_BASE_SYSTEM = dedent(
+    """
+    You are a helpful programming assistant.
+    Answer clearly and concisely in a way a beginner can understand.
+    """
+).strip()
 
-            Your answers MUST ALWAYS use EXACTLY three numbered sections
-            with these headings, in this order:
 
-            1. Core Idea
-            2. Step-by-Step Example
-            3. Common Mistake + Check-Your-Understanding Question
+def build_prompt_prefix(mode: Mode) -> str:
+    """
+    Static head of every prompt for `mode` (system block up to the question).
 
-            Formatting rules:
+    build_prompt() always starts with exactly this text, so its KV state can
+    be computed once and reused across requests.
+    """
+    if mode == "finetuned":
+        # Correct Llama chat-style wrapper (note the <</SYS>> closing tag)
+        return f"""<s>[INST] <<SYS>>
+{_FINETUNED_SYSTEM}
+<</SYS>>
 
-            - Do NOT write anything before "1. Core Idea".
-            - Do NOT add extra headings or a closing summary.
-            - Do NOT include labels like "Student answer:" or "Tutor answer:".
-            - Use short paragraphs and plain language.
+Student question:
+"""
 
-            Content rules:
+    # Simple, non-chat prompt for better base completions
+    return f"""{_BASE_SYSTEM}
 
-            1. Core Idea
-               - Explain the main concept in 2–4 short sentences.
-               - Assume the student is a beginner.
+Question:
+"""
 
-            2. Step-by-Step Example
-               - Give a concrete, minimal Python example.
-               - Walk through what happens in the code in 2–4 sentences.
 
-            3. Common Mistake + Check-Your-Understanding Question
-               - Describe one common mistake students make with this concept.
-               - End with ONE short question the student can answer to check understanding.
-            """
-        ).strip()
+def build_prompt(
+    question: str,
+    mode: Mode,
+    context: Optional[str] = None,
+) -> str:
+    """
+    Build prompts for TinyLlama.
 
+    - finetuned: strict 1/2/3 tutoring structure with a chat-style template.
+    - base: simple Q&A completion prompt.
+    """
+
+    prefix = build_prompt_prefix(mode)
+
+    if mode == "finetuned":
         ctx_block = (
             f"\n\nContext for the tutor (reference notes):\n{context}"
             if context
             else ""
         )
 
-        # Correct Llama chat-style wrapper (note the <</SYS>> closing tag)
-        prompt = f"""<s>[INST] <<SYS>>
-{system}
-<</SYS>>
-
-Student question:
-{question}{ctx_block}
+        prompt = f"""{prefix}{question}{ctx_block}
 
 Write your answer now. [/INST]"""
         return prompt
 
     # -------- BASE MODEL PROMPT (simple completion) --------
-    system = dedent(
-        """
-        You are a helpful programming assistant.
-        Answer clearly and concisely in a way a beginner can understand.
-        """
-    ).strip()
-
     ctx_block = (
         f"\n\nExtra reference notes (optional, may be empty):\n{context}"
         if context
         else ""
     )
 
-    # Simple, non-chat prompt for better base completions
-    prompt = f"""{system}
-
-Question:
-{question}{ctx_block}
+    prompt = f"""{prefix}{question}{ctx_block}
 
 Answer:"""
 
@@ -1,5 +1,5 @@
 # ai_tutor/rag/__init__.py
 
 from .ingest import ingest_reference_corpus
-from .store import save_vector_store, load_vector_store
-from .retriever import retrieve_context
+from .store import save_vector_store, load_vector_store, write_vector_store
+from .retriever import Retriever, get_retriever, retrieve_context, retrieve_many
@@ -0,0 +1,377 @@
+# ai_tutor/rag/index.py
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ai_tutor.config import Config
+from ai_tutor.rag.store import (
+    QUANTIZATIONS,
+    QuantizedEmbeddings,
+    VectorStore,
+    load_quantized,
+    quantize_store,
+    store_fingerprint,
+    unique_tmp_path,
+    write_quantized,
+)
+
+BACKENDS = ("flat", "ivf", "hnsw")
+
+# Rows are normalized and added to FAISS in chunks of this size, so building
+# from a memory-mapped store never needs a second full copy in RAM.
+_ADD_CHUNK = 65536
+
+# float16 rows are upcast and scored this many at a time (numpy has no
+# half-precision BLAS kernel)
+_SCORE_CHUNK = 65536
+
+# Set bits per byte value (np.bitwise_count needs numpy >= 2)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _normalized(x: np.ndarray) -> np.ndarray:
+    x = np.array(x, dtype=np.float32, ndmin=2)
+    x /= np.linalg.norm(x, axis=1, keepdims=True) + 1e-8
+    return x
+
+
+def top_k_rows(scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best `top_k` columns per row of `scores`, highest first, without a full sort."""
+    top_k = max(0, min(top_k, scores.shape[1]))
+    if top_k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(scores.dtype), empty.astype(np.int64)
+    if top_k < scores.shape[1]:
+        rows = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        rows = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    best = np.take_along_axis(scores, rows, axis=1)
+    order = np.argsort(-best, axis=1)
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+def rescore(
+    embeddings: np.ndarray,
+    query: np.ndarray,
+    candidates: np.ndarray,
+    top_k: int,
+    normalized: bool = True,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact cosine top-k among `candidates` rows only; returns (scores, rows), 1-D."""
+    candidates = np.sort(np.asarray(candidates, dtype=np.int64))  # sorted = sequential reads
+    rows = np.asarray(embeddings[candidates], dtype=np.float32)
+    if not normalized:
+        rows = _normalized(rows)
+    exact = rows @ _normalized(query)[0]
+    best_scores, best = top_k_rows(exact[None, :], top_k)
+    return best_scores[0], candidates[best[0]]
+
+
+# ---------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------
+
+class SearchIndex:
+    """Top-k cosine search over the rows of a VectorStore."""
+
+    backend = "base"
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, rows), each (num_queries, top_k); missing hits have row -1."""
+        raise NotImplementedError
+
+    def save(self, index_dir: Path) -> None:
+        """Persist whatever is expensive to rebuild (nothing, by default)."""
+
+
+class FlatIndex(SearchIndex):
+    """
+    Exact search straight over the store's embedding matrix.
+
+    Rows are L2-normalized at build time, so scoring is one matrix product
+    against the (memory-mapped) matrix followed by an argpartition top-k.
+    Stores written before that are normalized once here, in memory.
+    Tombstoned rows (`deleted`) never make it into the results.
+    """
+
+    backend = "flat"
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        normalized: bool = True,
+        deleted: Optional[np.ndarray] = None,
+    ):
+        self.embeddings = embeddings if normalized else _normalized(embeddings)
+        self.deleted = deleted if deleted is not None and deleted.any() else None
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        q = _normalized(queries)
+        emb = self.embeddings
+        if emb.dtype == np.float32:
+            return q @ emb.T
+
+        out = np.empty((len(q), len(emb)), dtype=np.float32)
+        for start in range(0, len(emb), _SCORE_CHUNK):
+            block = np.asarray(emb[start:start + _SCORE_CHUNK], dtype=np.float32)
+            out[:, start:start + len(block)] = q @ block.T
+        return out
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        sims = self.scores(queries)
+        if self.deleted is None:
+            return top_k_rows(sims, top_k)
+
+        sims[:, self.deleted] = -np.inf
+        scores, rows = top_k_rows(sims, top_k)
+        rows[np.isneginf(scores)] = -1
+        return scores, rows
+
+
+class QuantizedIndex(SearchIndex):
+    """
+    Two-stage search: scan a compact copy for a shortlist, then rescore it.
+
+    The int8 copy is scored by dot product (1/4 of float32) and the binary
+    copy by Hamming distance between sign bits (1/32). The best
+    `top_k * rescore_factor` rows are then rescored against the
+    full-precision rows. Only the compact copy is read in full, so it is
+    what stays resident. The full-precision memmap is touched just for the
+    shortlisted rows.
+    """
+
+    def __init__(
+        self,
+        vs: VectorStore,
+        quantized: QuantizedEmbeddings,
+        rescore_factor: Optional[int] = None,
+    ):
+        self.backend = f"flat-{quantized.kind}"
+        self.embeddings = vs.embeddings
+        self.quantized = quantized
+        self.rescore_factor = rescore_factor or Config.rag_rescore_factor
+        self.deleted = vs.deleted if vs.deleted is not None and vs.deleted.any() else None
+
+    def coarse_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate similarity of every row (higher is better), shape (num_queries, num_docs)."""
+        q = _normalized(queries)
+        codes = self.quantized.codes
+        out = np.empty((len(q), len(codes)), dtype=np.float32)
+
+        if self.quantized.kind == "int8":
+            scales = self.quantized.scales
+            for start in range(0, len(codes), _SCORE_CHUNK):
+                block = np.asarray(codes[start:start + _SCORE_CHUNK], dtype=np.float32)
+                out[:, start:start + len(block)] = (q @ block.T) * scales[start:start + len(block)]
+            return out
+
+        q_bits = np.packbits(q > 0, axis=1)
+        for start in range(0, len(codes), _SCORE_CHUNK):
+            block = codes[start:start + _SCORE_CHUNK]
+            for i, bits in enumerate(q_bits):
+                hamming = _POPCOUNT[block ^ bits].sum(axis=1, dtype=np.int32)
+                out[i, start:start + len(block)] = -hamming
+        return out
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        q = _normalized(queries)
+        coarse = self.coarse_scores(q)
+        if self.deleted is not None:
+            coarse[:, self.deleted] = -np.inf
+        _, shortlist = top_k_rows(coarse, top_k * self.rescore_factor)
+
+        top_k = max(0, min(top_k, coarse.shape[1]))
+        scores = np.full((len(q), top_k), -np.inf, dtype=np.float32)
+        rows = np.full((len(q), top_k), -1, dtype=np.int64)
+        for i, candidates in enumerate(shortlist):
+            candidates = candidates[~np.isneginf(coarse[i, candidates])]
+            best_scores, best_rows = rescore(self.embeddings, q[i], candidates, top_k)
+            scores[i, :len(best_rows)] = best_scores
+            rows[i, :len(best_rows)] = best_rows
+        return scores, rows
+
+
+class FaissIndex(SearchIndex):
+    """Approximate inner-product search over L2-normalized rows (IVF or HNSW)."""
+
+    def __init__(self, index, backend: str, params: dict):
+        self.index = index
+        self.backend = backend
+        self.params = params
+        self.set_search_params()
+
+    def set_search_params(
+        self,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> None:
+        """Apply query-time knobs; they are not part of the persisted index."""
+        import faiss
+
+        if self.backend == "ivf":
+            faiss.extract_index_ivf(self.index).nprobe = nprobe or Config.rag_ivf_nprobe
+        elif self.backend == "hnsw":
+            # HNSW cannot take explicit ids, so it sits inside an IndexIDMap
+            hnsw_index = self.index
+            if isinstance(hnsw_index, faiss.IndexIDMap):
+                hnsw_index = faiss.downcast_index(hnsw_index.index)
+            hnsw_index.hnsw.efSearch = ef_search or Config.rag_hnsw_ef_search
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores, rows = self.index.search(_normalized(queries), top_k)
+        return scores, rows
+
+    def save(self, index_dir: Path) -> None:
+        """
+        Persist next to the store. Each file is written to its own temp file
+        and swapped in with os.replace, so concurrent savers and readers never
+        see a partly written index; the meta file goes last.
+        """
+        import faiss
+
+        meta = {"backend": self.backend, "params": self.params, **store_fingerprint(index_dir)}
+        ann_file = _ann_file(index_dir, self.backend)
+        meta_file = _ann_meta_file(index_dir, self.backend)
+        tmp_ann, tmp_meta = unique_tmp_path(ann_file), unique_tmp_path(meta_file)
+        try:
+            faiss.write_index(self.index, str(tmp_ann))
+            tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+            os.replace(tmp_ann, ann_file)
+            os.replace(tmp_meta, meta_file)
+        finally:
+            tmp_ann.unlink(missing_ok=True)
+            tmp_meta.unlink(missing_ok=True)
+
+
+def _build_faiss(embeddings: np.ndarray, backend: str, rows: np.ndarray) -> FaissIndex:
+    """Index only `rows` (the live ones); results carry store row numbers as ids."""
+    import faiss
+
+    num_docs, dim = len(rows), embeddings.shape[1]
+
+    if backend == "ivf":
+        # ~4*sqrt(N) lists is the usual starting point; never more lists than rows
+        nlist = Config.rag_ivf_nlist or int(4 * np.sqrt(num_docs))
+        nlist = max(1, min(nlist, num_docs))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+
+        # k-means does not need every row; 256 points per list is plenty
+        rng = np.random.default_rng(0)
+        sample_size = min(num_docs, nlist * 256)
+        sample = np.sort(rng.choice(rows, size=sample_size, replace=False))
+        index.train(_normalized(embeddings[sample]))
+        params = {"nlist": nlist}
+    elif backend == "hnsw":
+        hnsw_index = faiss.IndexHNSWFlat(dim, Config.rag_hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        hnsw_index.hnsw.efConstruction = Config.rag_hnsw_ef_construction
+        index = faiss.IndexIDMap(hnsw_index)
+        params = {"m": Config.rag_hnsw_m, "ef_construction": Config.rag_hnsw_ef_construction}
+    else:
+        raise ValueError(f"Unknown FAISS backend '{backend}'")
+
+    for start in range(0, num_docs, _ADD_CHUNK):
+        batch = rows[start:start + _ADD_CHUNK]
+        index.add_with_ids(_normalized(embeddings[batch]), batch.astype(np.int64))
+
+    return FaissIndex(index, backend, params)
+
+
+# ---------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------
+
+def _ann_file(index_dir: Path, backend: str) -> Path:
+    return index_dir / f"ann_{backend}.faiss"
+
+
+def _ann_meta_file(index_dir: Path, backend: str) -> Path:
+    return index_dir / f"ann_{backend}.json"
+
+
+def _load_faiss(index_dir: Path, backend: str) -> Optional[FaissIndex]:
+    import faiss
+
+    meta_file = _ann_meta_file(index_dir, backend)
+    if not meta_file.exists() or not _ann_file(index_dir, backend).exists():
+        return None
+
+    meta = json.loads(meta_file.read_text(encoding="utf-8"))
+    fingerprint = store_fingerprint(index_dir)
+    if not fingerprint or any(meta.get(k) != v for k, v in fingerprint.items()):
+        print(f"[RAG] Persisted {backend} index is older than the vector store; rebuilding.")
+        return None
+
+    index = faiss.read_index(str(_ann_file(index_dir, backend)))
+    return FaissIndex(index, backend, meta.get("params", {}))
+
+
+def build_index(
+    vs: VectorStore,
+    backend: Optional[str] = None,
+    quantization: Optional[str] = None,
+) -> SearchIndex:
+    """Build (but do not persist) a search index of the given backend."""
+    backend = backend or Config.rag_index_backend
+    quantization = quantization or Config.rag_quantization
+    if backend not in BACKENDS:
+        raise ValueError(f"RAG_INDEX_BACKEND must be one of {BACKENDS}, got '{backend}'")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"RAG_QUANTIZATION must be one of {QUANTIZATIONS}, got '{quantization}'")
+
+    if backend == "flat" and quantization != "none" and vs.num_live and vs.normalized:
+        return QuantizedIndex(vs, quantize_store(vs, quantization))
+
+    if backend == "flat" or vs.num_live == 0:
+        return FlatIndex(vs.embeddings, vs.normalized, vs.deleted)
+
+    try:
+        import faiss  # noqa: F401
+    except ImportError:
+        print(f"[RAG WARNING] faiss is not installed; using exact search instead of '{backend}'.")
+        return FlatIndex(vs.embeddings, vs.normalized, vs.deleted)
+
+    rows = np.arange(len(vs.ids)) if vs.deleted is None else np.flatnonzero(~vs.deleted)
+    return _build_faiss(vs.embeddings, backend, rows)
+
+
+def load_index(
+    vs: VectorStore,
+    backend: Optional[str] = None,
+    index_dir: Optional[Path] = None,
+    quantization: Optional[str] = None,
+) -> SearchIndex:
+    """
+    Return the configured index for `vs`.
+
+    A persisted ANN index or quantized copy is reused when it was built from
+    the current store; otherwise it is built now and saved next to the store.
+    """
+    backend = backend or Config.rag_index_backend
+    index_dir = index_dir or Config.rag_index_path
+    quantization = quantization or Config.rag_quantization
+
+    if backend == "flat" and quantization != "none" and vs.num_live and vs.normalized:
+        if not store_fingerprint(index_dir):
+            return build_index(vs, backend, quantization)
+        quantized = load_quantized(quantization, index_dir) or write_quantized(vs, quantization, index_dir)
+        return QuantizedIndex(vs, quantized)
+
+    if backend != "flat":
+        try:
+            loaded = _load_faiss(index_dir, backend)
+        except ImportError:
+            loaded = None
+        if loaded is not None:
+            return loaded
+
+    index = build_index(vs, backend)
+    if isinstance(index, FaissIndex) and store_fingerprint(index_dir):
+        index.save(index_dir)
+    return index
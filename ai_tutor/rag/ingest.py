@@ -2,8 +2,22 @@
 
 from __future__ import annotations
 
+import json
+import os
+import re
 from dataclasses import dataclass
-from typing import List
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# (start, end) character spans of the tokens in a text
+Tokenize = Callable[[str], List[Tuple[int, int]]]
+
+TEXT_SUFFIXES = {".md", ".markdown", ".txt", ".rst"}
+CODE_SUFFIXES = {".py", ".ipynb", ".js", ".ts", ".java", ".c", ".h", ".cpp", ".cs", ".sql", ".sh"}
+_HEADING = re.compile(r"^\s*#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
 
 
 @dataclass
@@ -43,3 +57,140 @@ def ingest_reference_corpus() -> List[ReferenceDoc]:
         ),
     ]
     return docs
+
+
+# ---------------------------------------------------------------
+# Streaming ingestion of course material from disk
+# ---------------------------------------------------------------
+
+def _title_for(path: Path, text: str) -> str:
+    if path.suffix in {".md", ".markdown"}:
+        match = _HEADING.search(text)
+        if match:
+            return match.group(1)
+    return path.stem.replace("_", " ").replace("-", " ").strip() or path.name
+
+
+def _read_notebook(path: Path) -> str:
+    cells = json.loads(path.read_text(encoding="utf-8")).get("cells", [])
+    return "\n\n".join("".join(cell.get("source", [])) for cell in cells)
+
+
+def iter_jsonl_documents(path: Path) -> Iterator[ReferenceDoc]:
+    """One ReferenceDoc per line: {"id", "title", "content" (or "text")}."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            content = obj.get("content") or obj.get("text") or ""
+            if not content.strip():
+                continue
+            doc_id = str(obj.get("id") or f"{path.stem}:{line_no}")
+            yield ReferenceDoc(id=doc_id, title=obj.get("title") or doc_id, content=content)
+
+
+def iter_corpus_documents(root: Path) -> Iterator[ReferenceDoc]:
+    """
+    Lazily yield documents from a directory tree (or a single file).
+
+    Markdown/text/code files become one document each, keyed by their path
+    relative to `root`; .jsonl files contribute one document per line.
+    Files are read one at a time and in a stable (sorted) order.
+    """
+    if root.is_file():
+        paths: Iterable[Path] = [root]
+        base = root.parent
+    else:
+        paths = _walk_sorted(root)
+        base = root
+
+    for path in paths:
+        suffix = path.suffix.lower()
+        if suffix == ".jsonl":
+            yield from iter_jsonl_documents(path)
+            continue
+        if suffix not in TEXT_SUFFIXES and suffix not in CODE_SUFFIXES:
+            continue
+
+        try:
+            text = _read_notebook(path) if suffix == ".ipynb" else path.read_text(encoding="utf-8")
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            print(f"[RAG WARNING] Skipping {path}: {exc}")
+            continue
+        if not text.strip():
+            continue
+
+        yield ReferenceDoc(
+            id=path.relative_to(base).as_posix(),
+            title=_title_for(path, text),
+            content=text,
+        )
+
+
+def _walk_sorted(root: Path) -> Iterator[Path]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if not name.startswith("."):
+                yield Path(dirpath) / name
+
+
+# ---------------------------------------------------------------
+# Chunking
+# ---------------------------------------------------------------
+
+def whitespace_spans(text: str) -> List[Tuple[int, int]]:
+    """Fallback tokenizer: every run of non-whitespace is one token."""
+    return [m.span() for m in re.finditer(r"\S+", text)]
+
+
+def chunk_document(
+    doc: ReferenceDoc,
+    max_tokens: int,
+    overlap: int,
+    tokenize: Tokenize = whitespace_spans,
+) -> Iterator[ReferenceDoc]:
+    """
+    Split `doc` into windows of at most `max_tokens` tokens, each sharing
+    `overlap` tokens with the previous one.
+
+    Chunks are slices of the original text (code indentation survives);
+    documents that already fit are yielded unchanged.
+    """
+    spans = tokenize(doc.content)
+    if len(spans) <= max_tokens:
+        if spans:
+            yield doc
+        return
+
+    step = max(1, max_tokens - overlap)
+    for part, start in enumerate(range(0, len(spans), step)):
+        window = spans[start:start + max_tokens]
+        yield ReferenceDoc(
+            id=f"{doc.id}#{part}",
+            title=doc.title,
+            content=doc.content[window[0][0]:window[-1][1]],
+        )
+        if start + max_tokens >= len(spans):
+            break
+
+
+def iter_chunks(
+    docs: Iterable[ReferenceDoc],
+    max_tokens: int,
+    overlap: int,
+    tokenize: Tokenize = whitespace_spans,
+) -> Iterator[ReferenceDoc]:
+    for doc in docs:
+        yield from chunk_document(doc, max_tokens, overlap, tokenize)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,167 @@
+# ai_tutor/rag/lexical.py
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_tutor.config import Config
+from ai_tutor.rag.store import VectorStore, store_fingerprint, unique_tmp_path
+
+# Identifiers stay whole, so `__init__`, `self` and `range` are exact terms
+_TOKEN = re.compile(r"[a-z_][a-z0-9_]*|\d+")
+
+_FILES = ("bm25_offsets.npy", "bm25_docs.npy", "bm25_weights.npy")
+_VOCAB_FILE = "bm25_vocab.json"
+_META_FILE = "bm25.json"
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of a VectorStore.
+
+    Postings are stored CSR-style: for term t, rows docs[offsets[t]:offsets[t+1]]
+    with precomputed impacts weights[...] = idf(t) * tf-saturation(tf, doc length).
+    A query is scored by summing the impacts of its terms, so there is
+    no per-query length normalization or idf work. Only docs containing a
+    query term are touched.
+    """
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        weights: np.ndarray,
+    ):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+
+    @classmethod
+    def build(
+        cls,
+        texts: Sequence[str],
+        deleted: Optional[np.ndarray] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        term_ids, doc_ids, tfs = array("i"), array("i"), array("f")
+        lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for row in range(len(texts)):
+            if deleted is not None and deleted[row]:
+                continue
+            counts: Dict[int, int] = {}
+            tokens = tokenize(texts[row])
+            for token in tokens:
+                term = vocab.setdefault(token, len(vocab))
+                counts[term] = counts.get(term, 0) + 1
+            lengths[row] = len(tokens)
+            term_ids.extend(counts.keys())
+            doc_ids.extend([row] * len(counts))
+            tfs.extend(counts.values())
+
+        terms = np.frombuffer(term_ids, dtype=np.int32)
+        rows = np.frombuffer(doc_ids, dtype=np.int32)
+        tf = np.frombuffer(tfs, dtype=np.float32)
+
+        num_live = len(texts) - (int(deleted.sum()) if deleted is not None else 0)
+        avg_len = lengths.sum() / max(1, num_live)
+        doc_freq = np.bincount(terms, minlength=len(vocab)).astype(np.float32)
+        idf = np.log1p((num_live - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        norm = k1 * (1 - b + b * lengths[rows] / max(avg_len, 1e-6))
+        weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+        order = np.argsort(terms, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(doc_freq.astype(np.int64), out=offsets[1:])
+        return cls(vocab, offsets, rows[order], weights[order])
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, rows) of the best `top_k` docs, highest first (may be fewer)."""
+        spans = [
+            (self.offsets[t], self.offsets[t + 1])
+            for t in {self.vocab[tok] for tok in tokenize(query) if tok in self.vocab}
+        ]
+        if not spans or top_k <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        docs = np.concatenate([self.docs[s:e] for s, e in spans])
+        weights = np.concatenate([self.weights[s:e] for s, e in spans])
+        rows, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+
+        if top_k < len(rows):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.argsort(-scores[best])]
+        return scores[best], rows[best].astype(np.int64)
+
+    def save(self, index_dir: Path) -> None:
+        paths = [index_dir / name for name in (*_FILES, _VOCAB_FILE, _META_FILE)]
+        tmps = [unique_tmp_path(p) for p in paths]
+        try:
+            for tmp, arr in zip(tmps, (self.offsets, self.docs, self.weights)):
+                with open(tmp, "wb") as f:
+                    np.save(f, arr)
+            terms = sorted(self.vocab, key=self.vocab.get)
+            tmps[3].write_text(json.dumps(terms), encoding="utf-8")
+            meta = {"num_terms": len(terms), **store_fingerprint(index_dir)}
+            tmps[4].write_text(json.dumps(meta, indent=2), encoding="utf-8")
+            # Meta last: it is what marks the index as current
+            for tmp, path in zip(tmps, paths):
+                os.replace(tmp, path)
+        finally:
+            for tmp in tmps:
+                tmp.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, index_dir: Path) -> Optional["BM25Index"]:
+        """Memory-map a persisted index, or None if missing or built from another store."""
+        meta_file = index_dir / _META_FILE
+        if not meta_file.exists():
+            return None
+        meta = json.loads(meta_file.read_text(encoding="utf-8"))
+        fingerprint = store_fingerprint(index_dir)
+        if not fingerprint or any(meta.get(k) != v for k, v in fingerprint.items()):
+            return None
+
+        terms = json.loads((index_dir / _VOCAB_FILE).read_text(encoding="utf-8"))
+        offsets, docs, weights = (np.load(index_dir / name, mmap_mode="r") for name in _FILES)
+        return cls({term: i for i, term in enumerate(terms)}, offsets, docs, weights)
+
+
+def load_bm25_index(vs: VectorStore, index_dir: Optional[Path] = None) -> BM25Index:
+    """Persisted BM25 index for `vs`, (re)built and saved next to the store when stale."""
+    index_dir = index_dir or Config.rag_index_path
+    index = BM25Index.load(index_dir)
+    if index is None:
+        index = BM25Index.build(vs.texts, vs.deleted)
+        if store_fingerprint(index_dir):
+            index.save(index_dir)
+    return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[int]:
+    """Merge ranked row lists: score(row) = sum over lists of 1 / (k + rank)."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            if row >= 0:
+                fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
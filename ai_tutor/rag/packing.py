@@ -0,0 +1,97 @@
+# ai_tutor/rag/packing.py
+
+from __future__ import annotations
+
+import re
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+CountTokens = Callable[[str], int]
+
+SEPARATOR = "\n\n"
+
+# Sentence ends, or blank lines between paragraphs / code blocks
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_WORD = re.compile(r"\w+")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _shingles(text: str, n: int = 3) -> Set[Tuple[str, ...]]:
+    words = _WORD.findall(text.lower())
+    if len(words) < n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _near_duplicate(a: Set[Tuple[str, ...]], b: Set[Tuple[str, ...]], threshold: float) -> bool:
+    if not a or not b:
+        return a == b
+    return len(a & b) / len(a | b) >= threshold
+
+
+def _truncate(text: str, budget: int, count_tokens: CountTokens) -> Optional[str]:
+    """Longest run of whole leading sentences of `text` within `budget` tokens."""
+    kept: List[str] = []
+    for sentence in split_sentences(text):
+        candidate = " ".join(kept + [sentence])
+        if count_tokens(candidate) > budget:
+            break
+        kept.append(sentence)
+    return " ".join(kept) if kept else None
+
+
+def pack_context(
+    chunks: Sequence[str],
+    budget: int,
+    count_tokens: CountTokens,
+    dedupe_threshold: float = 0.8,
+) -> Tuple[Optional[str], int]:
+    """
+    Greedily fill `budget` tokens with `chunks`, best first.
+
+    Chunks whose word 3-grams overlap an already packed chunk by at least
+    `dedupe_threshold` (Jaccard) are skipped. The first chunk that does not
+    fit whole is cut at a sentence boundary and packing stops there.
+    Returns (context or None, its token count).
+    """
+    packed: List[str] = []
+    seen: List[Set[Tuple[str, ...]]] = []
+    used = 0
+    sep_tokens = count_tokens(SEPARATOR)
+
+    for chunk in chunks:
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        shingles = _shingles(chunk)
+        if any(_near_duplicate(shingles, s, dedupe_threshold) for s in seen):
+            continue
+
+        remaining = budget - used - (sep_tokens if packed else 0)
+        if remaining <= 0:
+            break
+        tokens = count_tokens(chunk)
+        if tokens > remaining:
+            truncated = _truncate(chunk, remaining, count_tokens)
+            if truncated is not None:
+                packed.append(truncated)
+            break
+
+        packed.append(chunk)
+        seen.append(shingles)
+        used += tokens + (sep_tokens if len(packed) > 1 else 0)
+
+    if not packed:
+        return None, 0
+
+    # Per-piece counts are not exactly additive; drop from the end until the
+    # joined text really fits
+    text = SEPARATOR.join(packed)
+    tokens = count_tokens(text)
+    while tokens > budget and packed:
+        packed.pop()
+        text = SEPARATOR.join(packed)
+        tokens = count_tokens(text) if packed else 0
+    return (text or None), tokens
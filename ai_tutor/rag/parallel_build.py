@@ -0,0 +1,235 @@
+# ai_tutor/rag/parallel_build.py
+
+from __future__ import annotations
+
+import hashlib
+import multiprocessing as mp
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from ai_tutor.config import Config
+from ai_tutor.rag.ingest import ReferenceDoc
+from ai_tutor.rag.store import (
+    IndexWriter,
+    VectorStore,
+    _get_embedder,
+    _iter_index_chunks,
+    chunk_hash,
+    load_vector_store,
+)
+
+SHARD_DIR = "shards"
+BATCH_SIZE_CANDIDATES = (16, 32, 64, 128)
+
+# ---------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------
+
+_worker_embedder: Optional[SentenceTransformer] = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_embedder
+    # Split the cores between workers instead of every worker using all of them
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_embedder = SentenceTransformer(model_name)
+
+
+def _encode_shard(texts: List[str], batch_size: int) -> np.ndarray:
+    embeddings = _worker_embedder.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    return embeddings.astype(np.float32)
+
+
+# ---------------------------------------------------------------
+# Main process side
+# ---------------------------------------------------------------
+
+def _length_sorted_shards(
+    chunks: Iterable[ReferenceDoc],
+    shard_size: int,
+    window: int,
+) -> Iterator[List[ReferenceDoc]]:
+    """
+    Cut `chunks` into shards, sorting each window of `window` chunks by
+    length first so every encoder batch pads to similar lengths.
+    """
+    buffer: List[ReferenceDoc] = []
+
+    def cut() -> Iterator[List[ReferenceDoc]]:
+        buffer.sort(key=lambda c: len(c.content))
+        for start in range(0, len(buffer), shard_size):
+            yield buffer[start:start + shard_size]
+        buffer.clear()
+
+    for chunk in chunks:
+        buffer.append(chunk)
+        if len(buffer) >= window:
+            yield from cut()
+    if buffer:
+        yield from cut()
+
+
+def _shard_digest(model_name: str, hashes: Sequence[bytes]) -> str:
+    h = hashlib.blake2b(model_name.encode("utf-8"), digest_size=8)
+    for chunk_digest in hashes:
+        h.update(chunk_digest)
+    return h.hexdigest()
+
+
+def tune_batch_size(
+    embedder: SentenceTransformer,
+    texts: Sequence[str],
+    candidates: Sequence[int] = BATCH_SIZE_CANDIDATES,
+) -> int:
+    """Pick the candidate batch size with the best texts/sec on a sample."""
+    sample = list(texts[:256])
+    if not sample:
+        return Config.rag_embed_batch_size
+
+    best, best_rate = candidates[0], 0.0
+    for batch_size in candidates:
+        start = time.perf_counter()
+        embedder.encode(sample, batch_size=batch_size, convert_to_numpy=True)
+        rate = len(sample) / (time.perf_counter() - start)
+        print(f"[RAG] batch_size={batch_size}: {rate:.1f} chunks/s")
+        if rate > best_rate:
+            best, best_rate = batch_size, rate
+    return best
+
+
+class _CountingDocs:
+    """Pass-through iterator that counts source documents for the docs/sec report."""
+
+    def __init__(self, docs: Iterable[ReferenceDoc]):
+        self._docs = docs
+        self.count = 0
+
+    def __iter__(self) -> Iterator[ReferenceDoc]:
+        for doc in self._docs:
+            self.count += 1
+            yield doc
+
+
+def build_vector_store_parallel(
+    docs: Iterable[ReferenceDoc],
+    index_dir: Optional[Path] = None,
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    shard_size: Optional[int] = None,
+) -> Tuple[VectorStore, Dict[str, float]]:
+    """
+    Full index build with embedding spread over a process pool.
+
+    Chunks are streamed, length-sorted per window and cut into shards of
+    `shard_size`; each shard is encoded by a worker holding its own
+    embedder. Finished shards are checkpointed under <index_dir>/shards,
+    so an interrupted build resumes without re-encoding them (a shard is
+    only reused if its chunks hash the same). batch_size=0 picks the
+    fastest batch size on a sample first.
+    """
+    index_dir = index_dir or Config.rag_index_path
+    workers = max(1, workers or Config.rag_embed_workers)
+    batch_size = Config.rag_embed_batch_size if batch_size is None else batch_size
+    shard_size = shard_size or Config.rag_embed_shard_size
+    model_name = Config.embedding_model_id
+
+    # The main process only chunks (with the embedder's tokenizer) and writes
+    embedder = _get_embedder(model_name)
+    counted = _CountingDocs(docs)
+    shards = _length_sorted_shards(_iter_index_chunks(counted, embedder), shard_size, shard_size * workers)
+
+    shard_dir = index_dir / SHARD_DIR
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    writer = IndexWriter(index_dir, model_name, dtype=Config.rag_embedding_dtype, normalized=True)
+    stats = {"chunks": 0, "resumed_chunks": 0}
+    inflight: Deque[Tuple[List[ReferenceDoc], List[bytes], Path, Optional[Future]]] = deque()
+    start = time.perf_counter()
+
+    def drain_one() -> None:
+        shard, hashes, path, future = inflight.popleft()
+        if future is None:
+            embeddings = np.load(path)
+            stats["resumed_chunks"] += len(shard)
+        else:
+            embeddings = future.result()
+            tmp = path.with_suffix(".tmp.npy")
+            np.save(tmp, embeddings)
+            os.replace(tmp, path)
+
+        writer.add(
+            embeddings,
+            [c.content for c in shard],
+            [c.id for c in shard],
+            [c.title for c in shard],
+            hashes,
+        )
+        stats["chunks"] += len(shard)
+        elapsed = time.perf_counter() - start
+        print(
+            f"[RAG] {stats['chunks']} chunks from {counted.count} docs "
+            f"({stats['chunks'] / elapsed:.1f} chunks/s, {counted.count / elapsed:.1f} docs/s)"
+        )
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads),
+        ) as pool:
+            for i, shard in enumerate(shards):
+                if batch_size == 0:
+                    batch_size = tune_batch_size(embedder, [c.content for c in shard])
+                    print(f"[RAG] Using batch_size={batch_size}")
+
+                hashes = [chunk_hash(c.content) for c in shard]
+                path = shard_dir / f"shard_{i:06d}_{_shard_digest(model_name, hashes)}.npy"
+                future = None
+                if not path.exists():
+                    future = pool.submit(_encode_shard, [c.content for c in shard], batch_size)
+                inflight.append((shard, hashes, path, future))
+
+                # Bounded look-ahead keeps every worker busy without
+                # buffering the whole corpus
+                while len(inflight) > 2 * workers:
+                    drain_one()
+            while inflight:
+                drain_one()
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+    # Checkpoints are only needed until the index is published
+    shutil.rmtree(shard_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    stats.update(
+        docs=counted.count,
+        seconds=elapsed,
+        chunks_per_s=stats["chunks"] / elapsed if elapsed else 0.0,
+        docs_per_s=counted.count / elapsed if elapsed else 0.0,
+        workers=workers,
+        batch_size=batch_size,
+    )
+    return load_vector_store(index_dir), stats
@@ -0,0 +1,135 @@
+# ai_tutor/rag/query_cache.py
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_tutor.answer_cache import normalize_question
+from ai_tutor.config import Config
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU of question -> unit-length embedding.
+
+    Keys are (model name, normalize_question(text)), so trivially different
+    phrasings of a repeated question skip the transformer forward pass.
+    With `path` set, entries are loaded at startup and written back at
+    exit (or on save()).
+    """
+
+    def __init__(self, max_entries: int = 2048, path: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Tuple[str, str], np.ndarray] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        if path is not None and path.exists():
+            self._load(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def encode(self, embedder, model_name: str, texts: Sequence[str]) -> np.ndarray:
+        """Embeddings for `texts`, shape (len(texts), dim); only misses are encoded, in one batch."""
+        if not self.enabled:
+            return _encode(embedder, [normalize_question(t) for t in texts])
+
+        keys = [(model_name, normalize_question(t)) for t in texts]
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: OrderedDict[Tuple[str, str], List[int]] = OrderedDict()
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._entries.get(key)
+                if vec is None:
+                    missing.setdefault(key, []).append(i)
+                    continue
+                self._entries.move_to_end(key)
+                self._hits += 1
+                out[i] = vec
+            self._misses += sum(len(rows) for rows in missing.values())
+
+        if missing:
+            # Encode the normalized text, so a vector never depends on which
+            # phrasing happened to be seen first
+            vecs = _encode(embedder, [question for _, question in missing])
+            with self._lock:
+                for (key, rows), vec in zip(missing.items(), vecs):
+                    self._entries[key] = vec
+                    self._entries.move_to_end(key)
+                    for i in rows:
+                        out[i] = vec
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return np.stack(out)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "persisted": self.path is not None,
+            }
+
+    def save(self) -> None:
+        if self.path is None or not self._entries:
+            return
+        with self._lock:
+            # Oldest first, so reloading restores the same LRU order
+            keys = list(self._entries)
+            vectors = list(self._entries.values())
+        if len({v.shape for v in vectors}) != 1:
+            print("[RAG WARNING] Not saving query cache: mixed embedding sizes")
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                models=np.array([m for m, _ in keys]),
+                questions=np.array([q for _, q in keys]),
+                vectors=np.stack(vectors),
+            )
+        os.replace(tmp, self.path)
+
+    def _load(self, path: Path) -> None:
+        try:
+            with np.load(path) as data:
+                for model, question, vec in zip(data["models"], data["questions"], data["vectors"]):
+                    self._entries[(str(model), str(question))] = vec.astype(np.float32)
+        except (OSError, KeyError, ValueError) as exc:
+            print(f"[RAG WARNING] Ignoring unreadable query cache {path}: {exc}")
+            self._entries.clear()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def _encode(embedder, texts: List[str]) -> np.ndarray:
+    vecs = embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(vecs, dtype=np.float32)
+
+
+@lru_cache(maxsize=1)
+def get_query_cache() -> QueryEmbeddingCache:
+    """Process-wide cache shared by the retriever and the semantic answer cache."""
+    path = Path(Config.rag_query_cache_path) if Config.rag_query_cache_path else None
+    cache = QueryEmbeddingCache(Config.rag_query_cache_size, path)
+    if path is not None:
+        atexit.register(cache.save)
+    return cache
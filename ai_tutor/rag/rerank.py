@@ -0,0 +1,148 @@
+# ai_tutor/rag/rerank.py
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+from sentence_transformers import CrossEncoder
+
+from ai_tutor.answer_cache import normalize_question
+from ai_tutor.config import Config
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class Reranker:
+    """
+    Cross-encoder rescoring of a retrieval shortlist.
+
+    (normalized question, chunk) pairs are scored in batches of up to
+    `batch_size`, and scores are cached per pair. Batches are shrunk to what
+    the remaining `budget_ms` allows at the running per-pair cost; once not
+    even one pair fits, the shortlist is returned in its original order
+    (scores computed so far are still cached).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        budget_ms: float = 150.0,
+        batch_size: int = 16,
+        cache_size: int = 4096,
+    ):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._model: Optional[CrossEncoder] = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._scores: OrderedDict[Tuple[str, bytes], float] = OrderedDict()
+        self._reranked = 0
+        self._gave_up = 0
+        self._cached_pairs = 0
+        self._scored_pairs = 0
+        # Running average of the model's cost per pair; None until first timed
+        self._pair_ms: Optional[float] = None
+
+    def _get_model(self) -> CrossEncoder:
+        with self._load_lock:
+            if self._model is None:
+                print(f"[RAG] Loading reranker '{self.model_name}'")
+                self._model = CrossEncoder(self.model_name)
+            return self._model
+
+    def warmup(self) -> None:
+        self._get_model().predict([("warmup", "warmup")])
+
+    def rerank(
+        self,
+        question: str,
+        hits: Sequence[Tuple[str, str]],
+        top_n: Optional[int] = None,
+    ) -> List[Tuple[str, str]]:
+        """Return `hits` (title, text) sorted by cross-encoder score, best first."""
+        top_n = len(hits) if top_n is None else top_n
+        if len(hits) <= 1:
+            return list(hits)[:top_n]
+
+        query = normalize_question(question)
+        keys = [(query, _text_key(text)) for _, text in hits]
+        scores: List[Optional[float]] = [None] * len(hits)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    scores[i] = self._scores[key]
+            self._cached_pairs += sum(s is not None for s in scores)
+
+        missing = [i for i, s in enumerate(scores) if s is None]
+        start = time.perf_counter()
+        done = 0
+        while done < len(missing):
+            size = self._batch_within(self.budget_ms - 1000 * (time.perf_counter() - start))
+            if size == 0:
+                with self._lock:
+                    self._gave_up += 1
+                return list(hits)[:top_n]
+
+            batch = missing[done:done + size]
+            model = self._get_model()
+            batch_start = time.perf_counter()
+            # The cache key's question, so a cached score always matches its key
+            predicted = model.predict([(query, hits[i][1]) for i in batch])
+            pair_ms = 1000 * (time.perf_counter() - batch_start) / len(batch)
+            with self._lock:
+                self._pair_ms = pair_ms if self._pair_ms is None else 0.8 * self._pair_ms + 0.2 * pair_ms
+                for i, score in zip(batch, predicted):
+                    scores[i] = float(score)
+                    self._scores[keys[i]] = float(score)
+                self._scored_pairs += len(batch)
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+            done += len(batch)
+
+        with self._lock:
+            self._reranked += 1
+        # Stable sort: ties keep their retrieval order
+        order = sorted(range(len(hits)), key=lambda i: -scores[i])
+        return [hits[i] for i in order[:top_n]]
+
+    def _batch_within(self, remaining_ms: float) -> int:
+        """Largest batch expected to finish in `remaining_ms` (0 = give up)."""
+        if remaining_ms <= 0:
+            return 0
+        with self._lock:
+            pair_ms = self._pair_ms
+        if pair_ms is None:
+            return 1  # a single pair first, to time the model
+        return min(self.batch_size, int(remaining_ms / max(pair_ms, 1e-3)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "reranked": self._reranked,
+                "gave_up": self._gave_up,
+                "cached_pairs": self._cached_pairs,
+                "scored_pairs": self._scored_pairs,
+                "cache_entries": len(self._scores),
+                "pair_ms": self._pair_ms,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_reranker() -> Reranker:
+    return Reranker(
+        Config.rag_rerank_model,
+        budget_ms=Config.rag_rerank_budget_ms,
+        batch_size=Config.rag_rerank_batch_size,
+        cache_size=Config.rag_rerank_cache_size,
+    )
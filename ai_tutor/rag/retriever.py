@@ -2,45 +2,171 @@
 
 from __future__ import annotations
 
-from typing import List, Tuple
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
 
-import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from ai_tutor.answer_cache import normalize_question
 from ai_tutor.config import Config
-from ai_tutor.rag.store import VectorStore, load_vector_store
+from ai_tutor.rag.index import SearchIndex, load_index, rescore
+from ai_tutor.rag.lexical import BM25Index, load_bm25_index, reciprocal_rank_fusion
+from ai_tutor.rag.query_cache import get_query_cache
+from ai_tutor.rag.store import VectorStore, _get_embedder, index_file_path, load_vector_store
 
 
-def _cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
-    a_norm = a / (np.linalg.norm(a, axis=-1, keepdims=True) + 1e-8)
-    b_norm = b / (np.linalg.norm(b, axis=-1, keepdims=True) + 1e-8)
-    return np.dot(a_norm, b_norm.T)
+RETRIEVAL_MODES = ("dense", "hybrid", "prefilter")
 
 
-def retrieve_context(question: str, top_k: int = 3) -> List[Tuple[str, str]]:
-    cfg = Config
+class Retriever:
+    """
+    Long-lived owner of the vector store, its search indexes and its embedder.
+
+    All are loaded lazily on first use (or eagerly via warmup()) and shared
+    by every caller. At most once per `reload_interval` seconds the index
+    file's mtime is checked, and a rebuilt index is swapped in without
+    restarting the process. Results are kept in a small LRU keyed by the
+    normalized question (RAG_RESULT_CACHE_SIZE), cleared on every reload.
+
+    Modes (RAG_RETRIEVAL_MODE):
+    - dense: embedding search only
+    - hybrid: dense and BM25 result lists merged by reciprocal rank fusion
+    - prefilter: BM25 picks candidates, which are then ranked by embedding
+      similarity (topped up from dense search when too few share a keyword)
+    """
+
+    def __init__(
+        self,
+        reload_interval: float = 1.0,
+        mode: Optional[str] = None,
+        cache_size: Optional[int] = None,
+    ):
+        self.reload_interval = reload_interval
+        self.cache_size = Config.rag_result_cache_size if cache_size is None else cache_size
+        self.mode = mode or Config.rag_retrieval_mode
+        if self.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"RAG_RETRIEVAL_MODE must be one of {RETRIEVAL_MODES}, got '{self.mode}'")
+        self._lock = threading.Lock()
+        self._vs: Optional[VectorStore] = None
+        self._index: Optional[SearchIndex] = None
+        self._lexical: Optional[BM25Index] = None
+        self._embedder: Optional[SentenceTransformer] = None
+        self._mtime: Optional[int] = None
+        self._checked_at = 0.0
+        self._results: OrderedDict[Tuple[str, int], List[Tuple[str, str]]] = OrderedDict()
+
+    def warmup(self) -> None:
+        """Load indexes + embedder and run one encode so the first query is fast."""
+        _, _, _, embedder = self._load()
+        embedder.encode(["warmup"], convert_to_numpy=True)
+
+    def _load(self) -> Tuple[VectorStore, SearchIndex, Optional[BM25Index], SentenceTransformer]:
+        now = time.monotonic()
+        with self._lock:
+            if self._vs is not None and now - self._checked_at < self.reload_interval:
+                return self._vs, self._index, self._lexical, self._embedder
+
+            self._checked_at = now
+            index_file = index_file_path()
+            mtime = index_file.stat().st_mtime_ns if index_file.exists() else None
+            if self._vs is not None and mtime == self._mtime:
+                return self._vs, self._index, self._lexical, self._embedder
+
+            vs = load_vector_store()
+            if self._vs is not None:
+                print(f"[RAG] Reloaded vector store from {index_file}.")
+
+            # Optional sanity check: make sure index and config agree
+            if vs.model_name != Config.embedding_model_id:
+                print(
+                    f"[RAG WARNING] Vector store built with '{vs.model_name}', "
+                    f"but Config.embedding_model_id is '{Config.embedding_model_id}'."
+                )
 
-    vs: VectorStore = load_vector_store()
+            # Use the model name stored with the index so embeddings are in the same space
+            self._embedder = _get_embedder(vs.model_name)
+            self._index = load_index(vs)
+            self._lexical = load_bm25_index(vs) if self.mode != "dense" else None
+            self._vs = vs
+            self._mtime = mtime
+            self._results.clear()
+            return self._vs, self._index, self._lexical, self._embedder
 
-    # Optional sanity check: make sure index and config agree
-    if hasattr(vs, "model_name") and vs.model_name != cfg.embedding_model_id:
-        print(
-            f"[RAG WARNING] Vector store built with '{vs.model_name}', "
-            f"but Config.embedding_model_id is '{cfg.embedding_model_id}'."
-        )
+    def retrieve(self, question: str, top_k: int = 3) -> List[Tuple[str, str]]:
+        return self.retrieve_many([question], top_k=top_k)[0]
 
-    # Use the model name stored with the index so embeddings are in the same space
-    embedder = SentenceTransformer(vs.model_name)
+    def retrieve_many(self, questions: Sequence[str], top_k: int = 3) -> List[List[Tuple[str, str]]]:
+        """Encode and score a whole batch of questions with one matrix product."""
+        self._load()
+        keys = [(normalize_question(q), top_k) for q in questions]
+        results: List[Optional[List[Tuple[str, str]]]] = [None] * len(questions)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._results:
+                    self._results.move_to_end(key)
+                    results[i] = self._results[key]
 
-    query_emb = embedder.encode([question], convert_to_numpy=True)
-    sims = _cosine_similarity(query_emb, vs.embeddings)[0]
+        missing = [i for i, hits in enumerate(results) if hits is None]
+        if missing:
+            found = self._search([questions[i] for i in missing], top_k)
+            with self._lock:
+                for i, hits in zip(missing, found):
+                    results[i] = hits
+                    if self.cache_size > 0:
+                        self._results[keys[i]] = hits
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+        return results
 
-    top_indices = np.argsort(-sims)[:top_k]
+    def _search(self, questions: Sequence[str], top_k: int) -> List[List[Tuple[str, str]]]:
+        vs, index, lexical, embedder = self._load()
+
+        # Repeated questions skip the encoder; only cache misses are embedded
+        query_embs = get_query_cache().encode(embedder, vs.model_name, questions)
+
+        if self.mode == "dense":
+            ranked = index.search(query_embs, top_k)[1]
+        elif self.mode == "hybrid":
+            depth = max(top_k, Config.rag_hybrid_depth)
+            _, dense_rows = index.search(query_embs, depth)
+            ranked = [
+                reciprocal_rank_fusion([dense_rows[i], lexical.search(q, depth)[1]], k=Config.rag_rrf_k)[:top_k]
+                for i, q in enumerate(questions)
+            ]
+        else:
+            ranked = []
+            for i, q in enumerate(questions):
+                _, candidates = lexical.search(q, max(top_k, Config.rag_prefilter_candidates))
+                rows = list(rescore(vs.embeddings, query_embs[i], candidates, top_k, vs.normalized)[1])
+                if len(rows) < top_k:
+                    # Too few chunks share a keyword: top up from the full dense search
+                    dense_rows = index.search(query_embs[i:i + 1], top_k)[1][0]
+                    rows += [r for r in dense_rows if r >= 0 and r not in rows][:top_k - len(rows)]
+                ranked.append(rows)
+
+        results: List[List[Tuple[str, str]]] = []
+        for query_rows in ranked:
+            hits: List[Tuple[str, str]] = []
+            for idx in query_rows:
+                if idx < 0:  # ANN backends pad with -1 when fewer hits exist
+                    continue
+                hits.append((vs.titles[idx], vs.texts[idx]))
+            results.append(hits)
+
+        return results
+
+
+@lru_cache(maxsize=1)
+def get_retriever() -> Retriever:
+    return Retriever()
+
+
+def retrieve_context(question: str, top_k: int = 3) -> List[Tuple[str, str]]:
+    return get_retriever().retrieve(question, top_k=top_k)
 
-    results: List[Tuple[str, str]] = []
-    for idx in top_indices:
-        title = vs.titles[idx]
-        text = vs.texts[idx]
-        results.append((title, text))
 
-    return results
+def retrieve_many(questions: Sequence[str], top_k: int = 3) -> List[List[Tuple[str, str]]]:
+    return get_retriever().retrieve_many(questions, top_k=top_k)
@@ -2,84 +2,738 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
 import pickle
+import tempfile
+from array import array
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from ai_tutor.config import Config
-from ai_tutor.rag.ingest import ReferenceDoc
+from ai_tutor.rag.ingest import ReferenceDoc, Tokenize, batched, iter_chunks, whitespace_spans
+
+# ---------------------------------------------------------------
+# On-disk layout (inside Config.rag_index_path)
+#
+#   header.json        format_version, model_name, dim, dtype, num_docs,
+#                      num_deleted, normalized
+#   embeddings.bin     raw (num_docs, dim) matrix, row-major, opened with np.memmap
+#   <field>.bin        utf-8 strings for texts / ids / titles, concatenated
+#   <field>.idx        int64 offsets into <field>.bin, num_docs + 1 entries
+#   hashes.bin         16-byte content hash per row (the incremental-update manifest)
+#   deleted.bin        one byte per row, 1 = tombstoned by an incremental update
+#   quant_<kind>.*     optional compact int8 / binary copy of the embeddings,
+#                      derived from embeddings.bin (see write_quantized)
+#
+# Everything is memory-mapped read-only, so several worker processes share
+# the same pages through the OS page cache. header.json is written last;
+# its presence (and mtime) marks a complete index. Rows past the header's
+# num_docs are ignored, which is what lets updates append in place.
+# ---------------------------------------------------------------
+
+FORMAT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)  # v1: no hashes.bin / deleted.bin
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.bin"
+HASHES_FILE = "hashes.bin"
+DELETED_FILE = "deleted.bin"
+STRING_FIELDS = ("texts", "ids", "titles")
+QUANTIZATIONS = ("none", "int8", "binary")
+LEGACY_PICKLE_FILE = "vector_store.pkl"
+HASH_SIZE = 16
+
+
+def chunk_hash(content: str) -> bytes:
+    """
+    Content hash that decides whether a chunk must be re-embedded. Only the
+    text is embedded, so the title is left out: a title derived from a
+    renamed file's path does not force a re-embed.
+    """
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=HASH_SIZE).digest()
+
+
+class StringTable(Sequence[str]):
+    """Read-only list of strings backed by a memory-mapped blob + offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    @classmethod
+    def open(cls, index_dir: Path, field: str, num_rows: int) -> "StringTable":
+        offsets = np.fromfile(index_dir / f"{field}.idx", dtype=np.int64)[:num_rows + 1]
+        blob_file = index_dir / f"{field}.bin"
+        # np.memmap refuses zero-length files
+        if blob_file.stat().st_size:
+            blob = np.memmap(blob_file, dtype=np.uint8, mode="r")
+        else:
+            blob = np.empty(0, dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def __repr__(self) -> str:
+        return f"StringTable({len(self)} strings)"
 
 
 @dataclass
 class VectorStore:
     model_name: str
-    embeddings: np.ndarray  # shape: (num_docs, dim)
-    texts: List[str]
-    ids: List[str]
-    titles: List[str]
+    embeddings: np.ndarray  # shape: (num_docs, dim); np.memmap when loaded from disk
+    texts: Sequence[str]
+    ids: Sequence[str]
+    titles: Sequence[str]
+    # True when rows are unit-length, so cosine similarity is a plain dot product
+    normalized: bool = False
+    # (num_docs, HASH_SIZE) uint8 content hashes; None for indexes without a manifest
+    hashes: Optional[np.ndarray] = None
+    # Boolean tombstone mask; None when no row has ever been deleted
+    deleted: Optional[np.ndarray] = None
+
+    @property
+    def num_live(self) -> int:
+        if self.deleted is None:
+            return len(self.ids)
+        return len(self.ids) - int(self.deleted.sum())
+
+    def __repr__(self) -> str:
+        return (
+            f"VectorStore(model_name={self.model_name!r}, num_docs={self.num_live}, "
+            f"dim={self.embeddings.shape[1] if self.embeddings.ndim == 2 else 0}, "
+            f"dtype={self.embeddings.dtype})"
+        )
 
 
 def _get_embedder(model_name: str | None = None) -> SentenceTransformer:
     """
-    Create a SentenceTransformer embedder.
+    Return the process-wide SentenceTransformer embedder for `model_name`.
 
     If no model_name is given, fall back to the embedding model defined in Config.
     """
     if model_name is None:
         model_name = Config.embedding_model_id
+    return _load_embedder(model_name)
+
+
+@lru_cache(maxsize=2)
+def _load_embedder(model_name: str) -> SentenceTransformer:
     return SentenceTransformer(model_name)
 
 
-def build_vector_store(docs: List[ReferenceDoc]) -> VectorStore:
+def index_file_path() -> Path:
+    """File whose mtime changes whenever a new index is published."""
+    return Config.rag_index_path / HEADER_FILE
+
+
+# ---------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------
+
+class IndexWriter:
+    """
+    Stream rows into an on-disk index.
+
+    Rows are added in batches with add(); nothing is visible to readers
+    until commit() publishes a new header.json.
+
+    - New index (default): files are written as *.tmp and swapped in with
+      os.replace, so processes that still map the old index keep reading
+      the old inodes.
+    - append=True: rows are appended to the existing files in place.
+      Readers only map the first num_docs rows named by the header, so they
+      are unaffected until the header changes. Anything left past num_docs
+      by an interrupted update is truncated first.
+    """
+
+    def __init__(
+        self,
+        index_dir: Path,
+        model_name: str,
+        dtype: str = "float32",
+        normalized: bool = False,
+        append: bool = False,
+    ):
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.normalized = normalized
+        self.append = append
+        self.dim: Optional[int] = None
+        self.num_docs = 0
+        self._base_docs = 0
+
+        index_dir.mkdir(parents=True, exist_ok=True)
+        # Temp files this writer created, by final name; abort() removes only these
+        self._tmps: Dict[str, Path] = {}
+        # array('q') keeps per-row bookkeeping at 8 bytes, even for millions of chunks
+        self._offsets = {f: array("q", [0]) for f in STRING_FIELDS}
+
+        if append:
+            self._open_for_append()
+        else:
+            self._emb = open(self._tmp(EMBEDDINGS_FILE), "wb")
+            self._hashes = open(self._tmp(HASHES_FILE), "wb")
+            self._blobs = {f: open(self._tmp(f"{f}.bin"), "wb") for f in STRING_FIELDS}
+
+    def _tmp(self, name: str) -> Path:
+        if name not in self._tmps:
+            self._tmps[name] = unique_tmp_path(self.index_dir / name)
+        return self._tmps[name]
+
+    def _data_path(self, name: str) -> Path:
+        # Appends go straight into the live files; new indexes into *.tmp
+        return self.index_dir / name if self.append else self._tmp(name)
+
+    def _open_for_append(self) -> None:
+        header = read_header(self.index_dir)
+        if header["model_name"] != self.model_name or np.dtype(header["dtype"]) != self.dtype:
+            raise ValueError("Cannot append rows with a different embedding model or dtype.")
+        self.dim = header["dim"] or None
+        self.num_docs = self._base_docs = header["num_docs"]
+
+        def reopen(name: str, size: int):
+            f = open(self.index_dir / name, "r+b" if (self.index_dir / name).exists() else "w+b")
+            f.truncate(size)
+            f.seek(size)
+            return f
+
+        self._emb = reopen(EMBEDDINGS_FILE, self.num_docs * (self.dim or 0) * self.dtype.itemsize)
+        self._hashes = reopen(HASHES_FILE, self.num_docs * HASH_SIZE)
+        self._blobs = {}
+        for field in STRING_FIELDS:
+            offsets = np.fromfile(self.index_dir / f"{field}.idx", dtype=np.int64)[:self.num_docs + 1]
+            self._offsets[field] = array("q", offsets.tobytes())
+            self._blobs[field] = reopen(f"{field}.bin", int(offsets[-1]))
+
+    def add(
+        self,
+        embeddings: np.ndarray,
+        texts: Iterable[str],
+        ids: Iterable[str],
+        titles: Iterable[str],
+        hashes: Optional[Iterable[bytes]] = None,
+    ) -> None:
+        embeddings = np.ascontiguousarray(embeddings, dtype=self.dtype)
+        if embeddings.ndim != 2:
+            raise ValueError(f"Expected a 2-D embedding batch, got shape {embeddings.shape}")
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Embedding dim {embeddings.shape[1]} != index dim {self.dim}")
+
+        columns = {"texts": list(texts), "ids": list(ids), "titles": list(titles)}
+        for field, values in columns.items():
+            if len(values) != len(embeddings):
+                raise ValueError(f"{len(values)} {field} for {len(embeddings)} embeddings")
+        if hashes is None:
+            hashes = [chunk_hash(c) for c in columns["texts"]]
+
+        self._emb.write(embeddings.tobytes())
+        self._hashes.write(b"".join(hashes))
+        for field, values in columns.items():
+            blob, offsets = self._blobs[field], self._offsets[field]
+            for value in values:
+                data = value.encode("utf-8")
+                blob.write(data)
+                offsets.append(offsets[-1] + len(data))
+        self.num_docs += len(embeddings)
+
+    def commit(self, deleted: Optional[np.ndarray] = None) -> None:
+        """
+        Publish the index. `deleted` is the tombstone mask for rows that
+        existed before this writer was opened (append mode only).
+        """
+        self._close_files()
+
+        mask = np.zeros(self.num_docs, dtype=np.uint8)
+        if deleted is not None:
+            mask[:len(deleted)] = deleted
+        mask.tofile(self._tmp(DELETED_FILE))
+        for field in STRING_FIELDS:
+            np.frombuffer(self._offsets[field], dtype=np.int64).tofile(self._tmp(f"{field}.idx"))
+
+        names = [DELETED_FILE] + [f"{f}.idx" for f in STRING_FIELDS]
+        if not self.append:
+            names += [EMBEDDINGS_FILE, HASHES_FILE] + [f"{f}.bin" for f in STRING_FIELDS]
+        for name in names:
+            os.replace(self._tmp(name), self.index_dir / name)
+
+        header = {
+            "format_version": FORMAT_VERSION,
+            "model_name": self.model_name,
+            "dim": self.dim or 0,
+            "dtype": self.dtype.name,
+            "num_docs": self.num_docs,
+            "num_deleted": int(mask.sum()),
+            "normalized": self.normalized,
+        }
+        tmp_header = self._tmp(HEADER_FILE)
+        tmp_header.write_text(json.dumps(header, indent=2), encoding="utf-8")
+        os.replace(tmp_header, self.index_dir / HEADER_FILE)
+
+    def abort(self) -> None:
+        self._close_files()
+        # Other writers (e.g. a concurrent FAISS or BM25 save) may have their
+        # own temp files in this directory
+        for tmp in self._tmps.values():
+            tmp.unlink(missing_ok=True)
+        self._tmps.clear()
+
+    def _close_files(self) -> None:
+        self._emb.close()
+        self._hashes.close()
+        for blob in self._blobs.values():
+            blob.close()
+
+
+def write_vector_store(vs: VectorStore, index_dir: Optional[Path] = None) -> None:
+    writer = IndexWriter(
+        index_dir or Config.rag_index_path,
+        vs.model_name,
+        dtype=vs.embeddings.dtype.name,
+        normalized=vs.normalized,
+    )
+    try:
+        writer.add(vs.embeddings, vs.texts, vs.ids, vs.titles)
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def _embedder_tokenize(embedder: SentenceTransformer) -> Tokenize:
+    """Token spans from the embedder's own (fast) tokenizer, so chunks fit its window."""
+    tokenizer = getattr(embedder, "tokenizer", None)
+    if tokenizer is None or not getattr(tokenizer, "is_fast", False):
+        return whitespace_spans
+
+    def spans(text: str) -> List[Tuple[int, int]]:
+        enc = tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False,
+        )
+        return [tuple(span) for span in enc["offset_mapping"]]
+
+    return spans
+
+
+def _iter_index_chunks(docs: Iterable[ReferenceDoc], embedder: SentenceTransformer) -> Iterable[ReferenceDoc]:
+    # Leave room for [CLS]/[SEP] so no chunk is silently truncated by the encoder
+    max_tokens = Config.rag_chunk_tokens
+    seq_len = getattr(embedder, "max_seq_length", None)
+    if seq_len:
+        max_tokens = min(max_tokens, seq_len - 2)
+    return iter_chunks(docs, max_tokens, Config.rag_chunk_overlap, _embedder_tokenize(embedder))
+
+
+def _encode(embedder: SentenceTransformer, texts: List[str]) -> np.ndarray:
+    # Unit-length rows, so search is a single dot product with no per-query
+    # normalization of the whole matrix
+    return embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def build_vector_store(
+    docs: Iterable[ReferenceDoc],
+    index_dir: Optional[Path] = None,
+) -> VectorStore:
+    """
+    Chunk, embed and write `docs` into `index_dir` batch by batch.
+
+    `docs` may be a lazy generator (see ingest.iter_corpus_documents): only
+    one batch of chunk texts and embeddings is held in memory at a time, so
+    peak memory does not grow with the corpus. Returns the memory-mapped
+    result.
+    """
+    index_dir = index_dir or Config.rag_index_path
+
     # Use the embedding model defined in Config
     model_name = Config.embedding_model_id
     embedder = _get_embedder(model_name)
+    chunks = _iter_index_chunks(docs, embedder)
 
-    texts = [doc.content for doc in docs]
-    ids = [doc.id for doc in docs]
-    titles = [doc.title for doc in docs]
-
-    embeddings = embedder.encode(texts, convert_to_numpy=True)
+    writer = IndexWriter(index_dir, model_name, dtype=Config.rag_embedding_dtype, normalized=True)
+    try:
+        for batch in batched(chunks, Config.rag_embed_batch_size):
+            texts = [chunk.content for chunk in batch]
+            writer.add(
+                _encode(embedder, texts),
+                texts,
+                [chunk.id for chunk in batch],
+                [chunk.title for chunk in batch],
+            )
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
 
-    return VectorStore(
-        model_name=model_name,
-        embeddings=embeddings,
-        texts=texts,
-        ids=ids,
-        titles=titles,
-    )
+    return load_vector_store(index_dir)
 
 
-def save_vector_store(docs: List[ReferenceDoc], rebuild: bool = False) -> VectorStore:
+def save_vector_store(docs: Iterable[ReferenceDoc], rebuild: bool = False) -> VectorStore:
     index_dir: Path = Config.rag_index_path
     index_dir.mkdir(parents=True, exist_ok=True)
-    index_file = index_dir / "vector_store.pkl"
 
-    if index_file.exists() and not rebuild:
+    if index_file_path().exists() and not rebuild:
         return load_vector_store()
 
-    vs = build_vector_store(docs)
+    return build_vector_store(docs, index_dir)
+
 
-    with open(index_file, "wb") as f:
-        pickle.dump(vs, f)
+# ---------------------------------------------------------------
+# Incremental updates
+# ---------------------------------------------------------------
 
+def update_vector_store(
+    docs: Iterable[ReferenceDoc],
+    index_dir: Optional[Path] = None,
+) -> Tuple[VectorStore, Dict[str, int]]:
+    """
+    Bring the index in line with `docs`, embedding only what changed.
+
+    Chunks are matched to existing rows by id and content hash. Each chunk
+    is counted once in the stats:
+    - unchanged: same id, same hash and title; kept as is
+    - changed: same id, new text or title; appended and the old row is
+      tombstoned (a title-only change reuses the vector)
+    - moved: new id, text already indexed (e.g. a renamed file); appended
+      with the existing vector
+    - added: new id, new text
+    - removed: ids that no longer appear; tombstoned
+    `embedded` counts the chunks that actually went through the embedder.
+
+    Compacts once tombstones exceed RAG_COMPACT_RATIO of the rows. Falls back
+    to a full build when there is no index yet, or when it was built with
+    another model or dtype, or without a manifest.
+    """
+    index_dir = index_dir or Config.rag_index_path
+    model_name = Config.embedding_model_id
+    stats = {"unchanged": 0, "added": 0, "changed": 0, "moved": 0, "removed": 0, "embedded": 0}
+
+    old = load_vector_store(index_dir) if (index_dir / HEADER_FILE).exists() else None
+    if (
+        old is None
+        or old.hashes is None
+        or old.model_name != model_name
+        or old.embeddings.dtype != np.dtype(Config.rag_embedding_dtype)
+    ):
+        if old is not None:
+            print("[RAG] Existing index has no manifest or a different model/dtype; rebuilding fully.")
+        vs = build_vector_store(docs, index_dir)
+        stats["added"] = stats["embedded"] = vs.num_live
+        return vs, stats
+
+    deleted = np.zeros(len(old.ids), dtype=bool) if old.deleted is None else old.deleted.copy()
+    live_rows = np.flatnonzero(~deleted)
+    row_by_id = {old.ids[row]: int(row) for row in live_rows}
+    row_by_hash = {old.hashes[row].tobytes(): int(row) for row in live_rows}
+    seen: set[str] = set()
+
+    embedder = _get_embedder(model_name)
+    writer = IndexWriter(index_dir, model_name, dtype=Config.rag_embedding_dtype, normalized=True, append=True)
+    pending: List[Tuple[ReferenceDoc, bytes]] = []
+
+    def flush() -> None:
+        texts = [chunk.content for chunk, _ in pending]
+        writer.add(
+            _encode(embedder, texts),
+            texts,
+            [chunk.id for chunk, _ in pending],
+            [chunk.title for chunk, _ in pending],
+            [h for _, h in pending],
+        )
+        stats["embedded"] += len(pending)
+        pending.clear()
+
+    try:
+        for chunk in _iter_index_chunks(docs, embedder):
+            seen.add(chunk.id)
+            h = chunk_hash(chunk.content)
+            row = row_by_id.get(chunk.id)
+            if row is not None and old.hashes[row].tobytes() == h and old.titles[row] == chunk.title:
+                stats["unchanged"] += 1
+                continue
+
+            if row is not None:
+                deleted[row] = True
+                stats["changed"] += 1
+
+            source = row_by_hash.get(h)
+            if source is not None:
+                writer.add(old.embeddings[source:source + 1], [chunk.content], [chunk.id], [chunk.title], [h])
+                if row is None:
+                    stats["moved"] += 1
+                continue
+
+            if row is None:
+                stats["added"] += 1
+
+            pending.append((chunk, h))
+            if len(pending) >= Config.rag_embed_batch_size:
+                flush()
+        if pending:
+            flush()
+
+        for doc_id, row in row_by_id.items():
+            if doc_id not in seen:
+                deleted[row] = True
+                stats["removed"] += 1
+
+        writer.commit(deleted)
+    except BaseException:
+        writer.abort()
+        raise
+
+    vs = load_vector_store(index_dir)
+    if vs.deleted is not None and vs.deleted.sum() > Config.rag_compact_ratio * len(vs.ids):
+        vs = compact_vector_store(index_dir)
+    return vs, stats
+
+
+def compact_vector_store(index_dir: Optional[Path] = None) -> VectorStore:
+    """Rewrite the index without tombstoned rows (vectors are copied, not re-embedded)."""
+    index_dir = index_dir or Config.rag_index_path
+    old = load_vector_store(index_dir)
+    live_rows = np.arange(len(old.ids)) if old.deleted is None else np.flatnonzero(~old.deleted)
+
+    writer = IndexWriter(index_dir, old.model_name, dtype=old.embeddings.dtype.name, normalized=old.normalized)
+    try:
+        for batch in batched(live_rows, Config.rag_embed_batch_size * 16):
+            writer.add(
+                old.embeddings[batch],
+                [old.texts[row] for row in batch],
+                [old.ids[row] for row in batch],
+                [old.titles[row] for row in batch],
+                None if old.hashes is None else [old.hashes[row].tobytes() for row in batch],
+            )
+        if writer.dim is None:
+            writer.dim = old.embeddings.shape[1]
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+    print(f"[RAG] Compacted index: {len(old.ids)} -> {len(live_rows)} rows.")
+    return load_vector_store(index_dir)
+
+
+# ---------------------------------------------------------------
+# Quantized copies
+# ---------------------------------------------------------------
+
+# Rows quantized per step when deriving a compact copy
+_QUANT_CHUNK = 65536
+
+
+@dataclass
+class QuantizedEmbeddings:
+    """Compact copy of a store's embeddings used for a first-pass scan."""
+
+    kind: str  # "int8" or "binary"
+    codes: np.ndarray  # int8 (num_docs, dim), or uint8 sign bits (num_docs, ceil(dim / 8))
+    scales: Optional[np.ndarray] = None  # int8 only: row i ~= codes[i] * scales[i]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+
+def quantize_int8(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row scalar quantization to int8."""
+    x = np.asarray(x, dtype=np.float32)
+    scales = np.abs(x).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(x / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(x: np.ndarray) -> np.ndarray:
+    """One sign bit per dimension, packed 8 per byte."""
+    return np.packbits(np.asarray(x) > 0, axis=1)
+
+
+def unique_tmp_path(path: Path) -> Path:
+    """
+    A fresh temp file next to `path`, to be os.replace'd onto it. Unlike a
+    fixed "<name>.tmp", concurrent writers (e.g. several API workers
+    deriving the same file) never write into each other's temp file.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f"{path.name}.", suffix=".tmp", dir=path.parent)
+    os.close(fd)
+    return Path(tmp)
+
+
+def store_fingerprint(index_dir: Path) -> dict:
+    """Identifies the published store that derived files were built from."""
+    header = index_dir / HEADER_FILE
+    if not header.exists():
+        return {}
+    stat = header.stat()
+    return {"store_mtime_ns": stat.st_mtime_ns, "store_size": stat.st_size}
+
+
+def _quant_paths(index_dir: Path, kind: str) -> Tuple[Path, Path, Path]:
+    return (
+        index_dir / f"quant_{kind}.bin",
+        index_dir / f"quant_{kind}_scales.bin",
+        index_dir / f"quant_{kind}.json",
+    )
+
+
+def quantize_store(vs: VectorStore, kind: str) -> QuantizedEmbeddings:
+    """Quantize `vs` in memory (used when there is no index directory to persist to)."""
+    if kind == "int8":
+        codes, scales = quantize_int8(vs.embeddings)
+        return QuantizedEmbeddings(kind, codes, scales)
+    if kind == "binary":
+        return QuantizedEmbeddings(kind, quantize_binary(vs.embeddings))
+    raise ValueError(f"Unknown quantization '{kind}'")
+
+
+def write_quantized(vs: VectorStore, kind: str, index_dir: Optional[Path] = None) -> QuantizedEmbeddings:
+    """Derive and persist the `kind` copy of the published store at `index_dir`."""
+    index_dir = index_dir or Config.rag_index_path
+    codes_path, scales_path, meta_path = _quant_paths(index_dir, kind)
+    if kind not in ("int8", "binary"):
+        raise ValueError(f"Unknown quantization '{kind}'")
+
+    all_scales = []
+    tmp_codes, tmp_scales, tmp_meta = (unique_tmp_path(p) for p in (codes_path, scales_path, meta_path))
+    try:
+        with open(tmp_codes, "wb") as codes_f:
+            for start in range(0, len(vs.embeddings), _QUANT_CHUNK):
+                block = vs.embeddings[start:start + _QUANT_CHUNK]
+                if kind == "int8":
+                    codes, scales = quantize_int8(block)
+                    all_scales.append(scales)
+                else:
+                    codes = quantize_binary(block)
+                codes_f.write(codes.tobytes())
+        os.replace(tmp_codes, codes_path)
+        if kind == "int8":
+            np.concatenate(all_scales).tofile(tmp_scales)
+            os.replace(tmp_scales, scales_path)
+
+        # Meta last: it is what marks the copy as current
+        meta = {"kind": kind, "num_docs": len(vs.embeddings), "dim": vs.embeddings.shape[1], **store_fingerprint(index_dir)}
+        tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp_meta, meta_path)
+    finally:
+        for tmp in (tmp_codes, tmp_scales, tmp_meta):
+            tmp.unlink(missing_ok=True)
+    return load_quantized(kind, index_dir)
+
+
+def load_quantized(kind: str, index_dir: Optional[Path] = None) -> Optional[QuantizedEmbeddings]:
+    """Memory-map the persisted `kind` copy, or None if missing or stale."""
+    index_dir = index_dir or Config.rag_index_path
+    codes_path, scales_path, meta_path = _quant_paths(index_dir, kind)
+    if not meta_path.exists():
+        return None
+
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    fingerprint = store_fingerprint(index_dir)
+    if not fingerprint or any(meta.get(k) != v for k, v in fingerprint.items()):
+        return None
+
+    num_docs, dim = meta["num_docs"], meta["dim"]
+    if num_docs == 0:
+        return None
+    if kind == "int8":
+        codes = np.memmap(codes_path, dtype=np.int8, mode="r", shape=(num_docs, dim))
+        scales = np.fromfile(scales_path, dtype=np.float32)
+        return QuantizedEmbeddings(kind, codes, scales)
+    codes = np.memmap(codes_path, dtype=np.uint8, mode="r", shape=(num_docs, (dim + 7) // 8))
+    return QuantizedEmbeddings(kind, codes)
+
+
+# ---------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------
+
+def read_header(index_dir: Optional[Path] = None) -> dict:
+    index_dir = index_dir or Config.rag_index_path
+    header = json.loads((index_dir / HEADER_FILE).read_text(encoding="utf-8"))
+    version = header.get("format_version")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(
+            f"RAG index at {index_dir} has format_version {version}, "
+            f"expected one of {SUPPORTED_VERSIONS}. Rebuild it with build_rag_index.py --rebuild."
+        )
+    return header
+
+
+def _load_legacy_pickle(index_dir: Path) -> VectorStore:
+    print(
+        f"[RAG WARNING] Loading legacy pickle index from {index_dir / LEGACY_PICKLE_FILE}; "
+        "run build_rag_index.py --rebuild to convert it to the memory-mapped format."
+    )
+    with open(index_dir / LEGACY_PICKLE_FILE, "rb") as f:
+        vs: VectorStore = pickle.load(f)
     return vs
 
 
-def load_vector_store() -> VectorStore:
-    index_dir: Path = Config.rag_index_path
-    index_file = index_dir / "vector_store.pkl"
+def load_vector_store(index_dir: Optional[Path] = None) -> VectorStore:
+    index_dir = index_dir or Config.rag_index_path
 
-    if not index_file.exists():
+    if not (index_dir / HEADER_FILE).exists():
+        if (index_dir / LEGACY_PICKLE_FILE).exists():
+            return _load_legacy_pickle(index_dir)
         raise FileNotFoundError(
-            f"Vector store not found at {index_file}. Run build_rag_index.py first."
+            f"Vector store not found at {index_dir}. Run build_rag_index.py first."
         )
 
-    with open(index_file, "rb") as f:
-        vs: VectorStore = pickle.load(f)
+    header = read_header(index_dir)
+    num_docs, dim = header["num_docs"], header["dim"]
 
-    return vs
+    if num_docs:
+        embeddings = np.memmap(
+            index_dir / EMBEDDINGS_FILE,
+            dtype=np.dtype(header["dtype"]),
+            mode="r",
+            shape=(num_docs, dim),
+        )
+    else:
+        embeddings = np.empty((0, dim), dtype=np.dtype(header["dtype"]))
+
+    texts, ids, titles = (StringTable.open(index_dir, f, num_docs) for f in STRING_FIELDS)
+    if not len(texts) == len(ids) == len(titles) == num_docs:
+        raise ValueError(f"RAG index at {index_dir} is inconsistent with its header.")
+
+    hashes = deleted = None
+    if (index_dir / HASHES_FILE).exists():
+        hashes = np.fromfile(index_dir / HASHES_FILE, dtype=np.uint8)[:num_docs * HASH_SIZE]
+        hashes = hashes.reshape(num_docs, HASH_SIZE)
+    if header.get("num_deleted"):
+        deleted = np.fromfile(index_dir / DELETED_FILE, dtype=np.uint8)[:num_docs].astype(bool)
+
+    return VectorStore(
+        model_name=header["model_name"],
+        embeddings=embeddings,
+        texts=texts,
+        ids=ids,
+        titles=titles,
+        normalized=header.get("normalized", False),
+        hashes=hashes,
+        deleted=deleted,
+    )
@@ -0,0 +1,199 @@
+# ai_tutor/semantic_cache.py
+
+from __future__ import annotations
+
+import threading
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from ai_tutor.config import Config
+
+# Upper edges of the best-similarity histogram reported by stats()
+_SIM_BINS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0]
+
+
+def _default_embed(texts: list[str]) -> np.ndarray:
+    # Imported lazily: sentence-transformers is only needed when the cache is on.
+    # The embedder instance and the query-embedding cache are shared with the
+    # RAG retriever, so a question is encoded once for both.
+    from ai_tutor.rag.query_cache import get_query_cache
+    from ai_tutor.rag.store import _get_embedder
+
+    model_name = Config.embedding_model_id
+    return get_query_cache().encode(_get_embedder(model_name), model_name, texts)
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache that also matches paraphrased questions.
+
+    Questions are embedded with the RAG sentence embedder and kept in a fixed
+    (capacity x dim) matrix. A lookup returns the answer of the most similar
+    earlier question with the same scope (mode, context, sampling) when the
+    cosine similarity reaches `threshold`. When full, the least recently
+    used row is overwritten.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        threshold: float = 0.92,
+        embed: Optional[Callable[[list[str]], np.ndarray]] = None,
+    ):
+        self.capacity = max(0, capacity)
+        self.threshold = threshold
+        self._embed = embed or _default_embed
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # allocated on first insert
+        self._scopes = np.full(self.capacity, -1, dtype=np.int32)  # -1 = empty row
+        self._last_used = np.zeros(self.capacity, dtype=np.int64)
+        self._entries: list[Optional[Tuple[str, str, str]]] = [None] * self.capacity
+        # Scope ids are refcounted by row and freed with their last row, so
+        # per-context scopes (RAG) do not pile up beyond `capacity`
+        self._scope_ids: dict[str, int] = {}
+        self._scope_names: dict[int, str] = {}
+        self._scope_rows: dict[int, int] = {}
+        self._free_ids: list[int] = []
+        self._tick = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._hit_sim_total = 0.0
+        self._sim_hist = [0] * len(_SIM_BINS)
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def embed(self, question: str) -> np.ndarray:
+        vec = np.asarray(self._embed([question])[0], dtype=np.float32)
+        return vec / (np.linalg.norm(vec) + 1e-8)
+
+    def lookup(
+        self,
+        question: str,
+        scope: str,
+        vec: Optional[np.ndarray] = None,
+    ) -> Optional[Tuple[str, str, float]]:
+        """Return (answer, model_type, similarity) for the closest match, or None."""
+        if not self.enabled:
+            return None
+        if vec is None:
+            vec = self.embed(question)
+
+        with self._lock:
+            scope_id = self._scope_ids.get(scope)
+            rows = (
+                np.flatnonzero(self._scopes == scope_id)
+                if scope_id is not None and self._vectors is not None
+                else np.empty(0, dtype=np.int64)
+            )
+            if rows.size == 0:
+                self._misses += 1
+                return None
+
+            sims = self._vectors[rows] @ vec
+            best = int(np.argmax(sims))
+            sim = float(sims[best])
+            self._record_similarity(sim)
+
+            if sim < self.threshold:
+                self._misses += 1
+                return None
+
+            row = int(rows[best])
+            self._tick += 1
+            self._last_used[row] = self._tick
+            self._hits += 1
+            self._hit_sim_total += sim
+            _, answer, model_type = self._entries[row]
+            return answer, model_type, sim
+
+    def put(
+        self,
+        question: str,
+        scope: str,
+        answer: str,
+        model_type: str,
+        vec: Optional[np.ndarray] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        if vec is None:
+            vec = self.embed(question)
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, vec.shape[0]), dtype=np.float32)
+
+            empty = np.flatnonzero(self._scopes < 0)
+            if empty.size:
+                row = int(empty[0])
+            else:
+                row = int(np.argmin(self._last_used))
+                self._evictions += 1
+
+            if self._scopes[row] >= 0:
+                self._release_scope(int(self._scopes[row]))
+
+            self._tick += 1
+            self._vectors[row] = vec
+            self._scopes[row] = self._acquire_scope(scope)
+            self._last_used[row] = self._tick
+            self._entries[row] = (question, answer, model_type)
+
+    def purge(self) -> int:
+        with self._lock:
+            removed = int(np.count_nonzero(self._scopes >= 0))
+            self._scopes[:] = -1
+            self._entries = [None] * self.capacity
+            self._scope_ids.clear()
+            self._scope_names.clear()
+            self._scope_rows.clear()
+            self._free_ids.clear()
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": int(np.count_nonzero(self._scopes >= 0)),
+                "scopes": len(self._scope_ids),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "avg_hit_similarity": self._hit_sim_total / self._hits if self._hits else 0.0,
+                # Best similarity seen per lookup, bucketed by upper bin edge;
+                # use it to see how many lookups a lower threshold would turn into hits
+                "best_similarity_histogram": {
+                    f"<={edge}": count for edge, count in zip(_SIM_BINS, self._sim_hist)
+                },
+            }
+
+    def _acquire_scope(self, scope: str) -> int:
+        scope_id = self._scope_ids.get(scope)
+        if scope_id is None:
+            scope_id = self._free_ids.pop() if self._free_ids else len(self._scope_ids)
+            self._scope_ids[scope] = scope_id
+            self._scope_names[scope_id] = scope
+        self._scope_rows[scope_id] = self._scope_rows.get(scope_id, 0) + 1
+        return scope_id
+
+    def _release_scope(self, scope_id: int) -> None:
+        self._scope_rows[scope_id] -= 1
+        if self._scope_rows[scope_id] == 0:
+            del self._scope_rows[scope_id]
+            del self._scope_ids[self._scope_names.pop(scope_id)]
+            self._free_ids.append(scope_id)
+
+    def _record_similarity(self, sim: float) -> None:
+        for i, edge in enumerate(_SIM_BINS):
+            if sim <= edge or i == len(_SIM_BINS) - 1:
+                self._sim_hist[i] += 1
+                return
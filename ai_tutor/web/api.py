@@ -1,15 +1,71 @@
-from typing import Optional
+import asyncio
+import json
+import secrets
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
-from ai_tutor.llama_backend import generate_answer
+import numpy as np
+
+from ai_tutor.answer_cache import AnswerCache, cache_scope, make_cache_key
+from ai_tutor.config import Config
+from ai_tutor.faq_index import FAQIndex
+from ai_tutor.llama_backend import (
+    DEFAULT_MAX_TOKENS,
+    adapter_registry,
+    context_budget,
+    count_tokens,
+    early_stop_stats,
+    generate_answer,
+    model_fingerprint,
+    prompt_lookup,
+    resolve_adapter,
+    sampling_params,
+    stream_answer,
+    warm_model,
+)
 from ai_tutor.prompts import build_prompt  # for prompt_debug
+from ai_tutor.semantic_cache import SemanticAnswerCache
+from ai_tutor.web.scheduler import InferenceScheduler, QueueFullError
 
 
 app = FastAPI()
 
+# All llama.cpp work goes through this bounded pool instead of FastAPI's
+# default threadpool, so overload turns into fast 429s rather than a pile-up.
+scheduler = InferenceScheduler(
+    workers=Config.inference_workers,
+    max_queue=Config.inference_queue_size,
+)
+
+answer_cache = AnswerCache(
+    max_entries=Config.answer_cache_size,
+    ttl_seconds=Config.answer_cache_ttl_s,
+    db_path=Path(Config.answer_cache_db) if Config.answer_cache_db else None,
+    max_disk_entries=Config.answer_cache_disk_size,
+)
+
+semantic_cache: Optional[SemanticAnswerCache] = (
+    SemanticAnswerCache(
+        capacity=Config.semantic_cache_size,
+        threshold=Config.semantic_cache_threshold,
+    )
+    if Config.semantic_cache_enabled and Config.semantic_cache_size > 0
+    else None
+)
+
+faq_index: Optional[FAQIndex] = (
+    FAQIndex.load(Config.faq_index_path, threshold=Config.faq_threshold)
+    if Config.faq_index_enabled
+    else None
+)
+
 # Allow GitHub Pages frontend to call the API
 origins = [
     "https://eholt723.github.io",
@@ -21,14 +77,17 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache"],
 )
 
 
 class ChatRequest(BaseModel):
     question: str
     use_finetuned: bool = False
-    use_rag: bool = False  # ignored for now
+    use_rag: bool = False  # retrieve reference notes into the prompt
     debug_prompt: bool = False  # NEW: ask API to return the full prompt
+    temperature: Optional[float] = None  # None = mode default, 0 = greedy
+    adapter: Optional[str] = None  # LoRA adapter for finetuned mode (GET /adapters)
 
 
 class ChatResponse(BaseModel):
@@ -38,6 +97,48 @@ class ChatResponse(BaseModel):
     used_rag: bool
     context_preview: Optional[str] = None
     prompt_debug: Optional[str] = None  # NEW: echoes the prompt when requested
+    retrieval_ms: Optional[float] = None  # None when RAG was not requested
+    context_tokens: int = 0  # llama tokens the retrieved context added
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.on_event("startup")
+def warm_retriever() -> None:
+    if not Config.rag_warmup:
+        return
+    # Imported here: the RAG stack (sentence-transformers) is optional at runtime
+    from ai_tutor.rag.retriever import get_retriever
+
+    get_retriever().warmup()
+    if Config.rag_rerank:
+        from ai_tutor.rag.rerank import get_reranker
+
+        get_reranker().warmup()
+
+
+@app.on_event("startup")
+def warm_fingerprints() -> None:
+    # FAQ lookups key on the weights' fingerprint; hash them before the first request
+    if faq_index is None:
+        return
+    try:
+        model_fingerprint(False)
+        model_fingerprint(True)
+    except (OSError, RuntimeError) as exc:
+        print(f"[FAQ WARNING] Could not fingerprint the GGUF weights: {exc}")
+
+
+@app.on_event("shutdown")
+def shutdown_scheduler() -> None:
+    scheduler.shutdown()
 
 
 @app.get("/health")
@@ -45,10 +146,223 @@ def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics() -> dict:
+    return {
+        "scheduler": scheduler.snapshot(),
+        "answer_cache": answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "faq_index": faq_index.stats() if faq_index is not None else None,
+        "adapters": adapter_registry.stats(),
+        "early_stop": early_stop_stats.stats(),
+        "speculative": prompt_lookup.stats() if prompt_lookup is not None else None,
+        "query_embeddings": _rag_stats("query_cache", "get_query_cache"),
+        "reranker": _rag_stats("rerank", "get_reranker"),
+    }
+
+
+def _rag_stats(module_name: str, getter: str) -> Optional[dict]:
+    # Only reported once something has loaded the (optional) RAG stack
+    module = sys.modules.get(f"ai_tutor.rag.{module_name}")
+    return getattr(module, getter)().stats() if module is not None else None
+
+
+@app.get("/adapters")
+def adapters() -> dict:
+    return {
+        "adapters": adapter_registry.names(),
+        "default": resolve_adapter(True, None),
+    }
+
+
+def _adapter(req: ChatRequest) -> Optional[str]:
+    """Adapter the request runs with (None in base mode); 404 for unknown names."""
+    name = resolve_adapter(req.use_finetuned, req.adapter)
+    if req.adapter is not None and name is not None and name not in adapter_registry.names():
+        raise HTTPException(status_code=404, detail=f"Unknown adapter '{req.adapter}'")
+    return name
+
+
+def _require_admin(token: Optional[str]) -> None:
+    if not Config.admin_token or not secrets.compare_digest(token or "", Config.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.post("/admin/cache/purge")
+def purge_cache(x_admin_token: Optional[str] = Header(default=None)) -> dict:
+    _require_admin(x_admin_token)
+    return {
+        "purged": answer_cache.purge(),
+        "purged_semantic": semantic_cache.purge() if semantic_cache is not None else 0,
+    }
+
+
+class _CacheLookup:
+    """Outcome of checking the answer caches for one request."""
+
+    def __init__(
+        self,
+        scope: Optional[str] = None,
+        hit: Optional[Tuple[str, str]] = None,
+        status: str = "BYPASS",
+        vec: Optional[np.ndarray] = None,
+    ):
+        self.scope = scope  # None = this request must not be cached
+        self.hit = hit  # (answer, model_type)
+        self.status = status  # value of the X-Cache header
+        self.vec = vec  # question embedding, reused when storing a miss
+
+
+async def _lookup_answer(req: ChatRequest, context: Optional[str]) -> _CacheLookup:
+    """Check the exact cache, then the semantic cache for paraphrases."""
+    if not answer_cache.enabled and semantic_cache is None:
+        return _CacheLookup()
+    sampling = sampling_params(req.use_finetuned, req.temperature)
+    if Config.answer_cache_deterministic and sampling["temperature"] > 0:
+        return _CacheLookup()
+
+    scope = cache_scope(
+        req.use_finetuned,
+        context,
+        sampling,
+        DEFAULT_MAX_TOKENS,
+        _adapter(req),
+        grammar=req.use_finetuned and Config.llama_grammar,
+        early_stop=req.use_finetuned and Config.llama_early_stop and not Config.llama_grammar,
+    )
+    if answer_cache.enabled:
+        key = make_cache_key(req.question, scope)
+        # The sqlite tier does blocking I/O; keep it off the event loop
+        hit = await asyncio.to_thread(answer_cache.get, key) if answer_cache.on_disk else answer_cache.get(key)
+        if hit is not None:
+            return _CacheLookup(scope, hit, "HIT")
+
+    if semantic_cache is not None:
+        # Embedding is CPU work; keep it off the event loop
+        vec = await asyncio.to_thread(semantic_cache.embed, req.question)
+        found = semantic_cache.lookup(req.question, scope, vec=vec)
+        if found is not None:
+            return _CacheLookup(scope, (found[0], found[1]), "SEMANTIC", vec)
+        return _CacheLookup(scope, None, "MISS", vec)
+
+    return _CacheLookup(scope, None, "MISS")
+
+
+async def _lookup_faq(req: ChatRequest) -> Optional[_CacheLookup]:
+    """Precomputed FAQ answer, for requests without RAG and with default sampling."""
+    if faq_index is None or req.use_rag or req.temperature is not None:
+        return None
+
+    def match() -> Optional[Tuple[str, str, float]]:
+        try:
+            fingerprint = model_fingerprint(req.use_finetuned, _adapter(req))
+        except (OSError, RuntimeError):
+            return None  # weights missing: generation will report it
+        return faq_index.match(req.question, req.use_finetuned, fingerprint)
+
+    found = await asyncio.to_thread(match)
+    if found is None:
+        return None
+    # scope=None: FAQ answers are not copied into the answer caches
+    return _CacheLookup(None, (found[0], found[1]), "FAQ")
+
+
+def _remember_answer(req: ChatRequest, lookup: _CacheLookup, answer: str, model_type: str) -> None:
+    if lookup.scope is None:
+        return
+    if answer_cache.enabled:
+        answer_cache.put(make_cache_key(req.question, lookup.scope), answer, model_type)
+    if semantic_cache is not None:
+        semantic_cache.put(req.question, lookup.scope, answer, model_type, vec=lookup.vec)
+
+
+class _RagContext:
+    """Retrieved context for one request and what it cost."""
+
+    def __init__(
+        self,
+        text: Optional[str] = None,
+        retrieval_ms: Optional[float] = None,
+        tokens: int = 0,
+    ):
+        self.text = text
+        self.retrieval_ms = retrieval_ms
+        self.tokens = tokens
+
+
+def _retrieve(question: str) -> List[Tuple[str, str]]:
+    # Imported here: the RAG stack (sentence-transformers) is optional at runtime
+    from ai_tutor.rag.retriever import get_retriever
+
+    if not Config.rag_rerank:
+        return get_retriever().retrieve(question, top_k=Config.rag_top_k)
+
+    from ai_tutor.rag.rerank import get_reranker
+
+    shortlist = get_retriever().retrieve(question, top_k=max(Config.rag_top_k, Config.rag_rerank_candidates))
+    return get_reranker().rerank(question, shortlist, top_n=Config.rag_top_k)
+
+
+def _pack_context(req: ChatRequest, chunks: List[str]) -> Tuple[Optional[str], int]:
+    from ai_tutor.rag.packing import pack_context
+
+    budget = context_budget(req.question, req.use_finetuned, DEFAULT_MAX_TOKENS)
+    if Config.rag_context_tokens > 0:
+        budget = min(budget, Config.rag_context_tokens)
+    return pack_context(chunks, budget, count_tokens)
+
+
+async def _rag_context(req: ChatRequest) -> _RagContext:
+    """
+    Retrieve context for a use_rag request within RAG_TIMEOUT_MS.
+
+    The model load / system-prefix prefill runs at the same time on the
+    inference workers, so on a cold mode the retrieval cost is mostly hidden. On timeout or error the
+    request goes ahead without context; a timed-out retrieval still
+    finishes in the background and lands in the retriever's result cache.
+    Retrieved chunks are packed into the tokens the 1024-token window has
+    left after the prompt and the answer (see rag.packing).
+    """
+    if not req.use_rag:
+        return _RagContext()
+
+    async def timed_retrieval() -> Tuple[List[Tuple[str, str]], float]:
+        start = time.perf_counter()
+        try:
+            hits = await asyncio.wait_for(
+                asyncio.to_thread(_retrieve, req.question),
+                timeout=Config.rag_timeout_ms / 1000,
+            )
+        except asyncio.TimeoutError:
+            print(f"[RAG WARNING] Retrieval exceeded {Config.rag_timeout_ms:.0f} ms; answering without context.")
+            hits = []
+        except Exception as exc:
+            print(f"[RAG WARNING] Retrieval failed ({exc}); answering without context.")
+            hits = []
+        return hits, 1000 * (time.perf_counter() - start)
+
+    # The warm-up is llama work, so it goes through the inference scheduler
+    # (a full queue answers 429); other warm-up errors are left for the
+    # generation call to report
+    (hits, retrieval_ms), warmed = await asyncio.gather(
+        timed_retrieval(),
+        scheduler.run(warm_model, req.use_finetuned, _adapter(req)),
+        return_exceptions=True,
+    )
+    if isinstance(warmed, QueueFullError):
+        raise warmed
+    if not hits or isinstance(warmed, Exception):
+        # Without the llama tokenizer the context cannot be fitted safely
+        return _RagContext(None, round(retrieval_ms, 2))
+    text, tokens = await asyncio.to_thread(_pack_context, req, [content for _, content in hits])
+    return _RagContext(text, round(retrieval_ms, 2), tokens)
+
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest) -> ChatResponse:
-    # Phase 1: RAG is off, but the flag is kept for later
-    context: Optional[str] = None
+async def chat(req: ChatRequest, response: Response) -> ChatResponse:
+    _adapter(req)  # unknown adapters fail before any work
+    rag = await _rag_context(req)
+    context = rag.text
 
     # Build the prompt explicitly so we can optionally return it
     mode = "finetuned" if req.use_finetuned else "base"
@@ -58,18 +372,126 @@ def chat(req: ChatRequest) -> ChatResponse:
         context=context,
     )
 
-    # Core generation path
-    answer, model_type = generate_answer(
-        question=req.question,
-        use_finetuned=req.use_finetuned,
-        context=context,
-    )
+    lookup = await _lookup_faq(req) or await _lookup_answer(req, context)
+
+    if lookup.hit is not None:
+        answer, model_type = lookup.hit
+    else:
+        # Core generation path (runs on the inference worker pool)
+        answer, model_type = await scheduler.run(
+            generate_answer,
+            question=req.question,
+            use_finetuned=req.use_finetuned,
+            context=context,
+            temperature=req.temperature,
+            adapter=_adapter(req),
+        )
+        # Off the event loop: the answer cache may write to sqlite
+        await asyncio.to_thread(_remember_answer, req, lookup, answer, model_type)
+    response.headers["X-Cache"] = lookup.status
 
     return ChatResponse(
         question=req.question,
         answer=answer,
         model_type=model_type,
-        used_rag=False,
+        used_rag=context is not None,
         context_preview=context,
         prompt_debug=prompt if req.debug_prompt else None,
+        retrieval_ms=rag.retrieval_ms,
+        context_tokens=rag.tokens,
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event; JSON keeps newlines inside tokens safe."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest) -> StreamingResponse:
+    """
+    Same as /chat, but streams the answer as Server-Sent Events:
+
+    - "start": model_type / used_rag / retrieval_ms / context_tokens
+      (and prompt_debug when requested)
+    - "token": {"text": ...} for each cleaned chunk of the answer
+    - "done":  sent once generation has finished
+    - "error": {"detail": ...} if generation fails after the stream started
+
+    The model (and adapter) is loaded before the response starts, so load
+    errors get the same status codes as /chat.
+    """
+    _adapter(req)
+    rag = await _rag_context(req)
+    context = rag.text
+
+    mode = "finetuned" if req.use_finetuned else "base"
+    prompt = build_prompt(
+        question=req.question,
+        mode=mode,
+        context=context,
+    )
+
+    def start_event(model_type: str) -> str:
+        return _sse(
+            "start",
+            {
+                "question": req.question,
+                "model_type": model_type,
+                "used_rag": context is not None,
+                "retrieval_ms": rag.retrieval_ms,
+                "context_tokens": rag.tokens,
+                "prompt_debug": prompt if req.debug_prompt else None,
+            },
+        )
+
+    lookup = await _lookup_faq(req) or await _lookup_answer(req, context)
+
+    async def cached_events() -> AsyncIterator[str]:
+        answer, model_type = lookup.hit
+        yield start_event(model_type)
+        yield _sse("token", {"text": answer})
+        yield _sse("done", {"model_type": model_type})
+
+    def events() -> Iterator[str]:
+        # Runs on an inference worker, after the 200 has been sent, so a
+        # failure can only be reported in-band
+        try:
+            chunks, model_type = stream_answer(
+                question=req.question,
+                use_finetuned=req.use_finetuned,
+                context=context,
+                temperature=req.temperature,
+                adapter=_adapter(req),
+            )
+
+            # Sent before the first token so the client gets bytes immediately
+            yield start_event(model_type)
+            parts = []
+            for chunk in chunks:
+                parts.append(chunk)
+                yield _sse("token", {"text": chunk})
+        except Exception as exc:
+            print(f"[LLAMA WARNING] Streaming generation failed: {exc}")
+            yield _sse("error", {"detail": str(exc)})
+            return
+        # Only complete answers are cached
+        _remember_answer(req, lookup, "".join(parts).strip(), model_type)
+        yield _sse("done", {"model_type": model_type})
+
+    if lookup.hit is not None:
+        body = cached_events()
+    else:
+        # Load errors (missing GGUF / adapter) become a 500 here, like /chat
+        await scheduler.run(warm_model, req.use_finetuned, _adapter(req))
+        body = scheduler.stream(events)
+
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Cache": lookup.status,
+        },
     )
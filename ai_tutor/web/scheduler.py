@@ -0,0 +1,181 @@
+# ai_tutor/web/scheduler.py
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class QueueFullError(RuntimeError):
+    """Raised when every worker is busy and the wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceScheduler:
+    """
+    Bounded worker pool that keeps llama.cpp calls off the event loop.
+
+    At most `workers` jobs run at once and at most `max_queue` more may wait;
+    anything beyond that is rejected immediately with QueueFullError instead
+    of piling up threads. Wait and run times are tracked for /metrics.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="llama-worker",
+        )
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._started = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._recent_waits: deque[float] = deque(maxlen=256)
+
+    # ---------------------------------------------------------------
+    # Admission + bookkeeping
+    # ---------------------------------------------------------------
+
+    def _admit(self) -> float:
+        with self._lock:
+            if self._queued + self._running >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise QueueFullError(self._retry_after())
+            self._queued += 1
+        return time.perf_counter()
+
+    def _retry_after(self) -> int:
+        # Rough estimate: time for the current backlog to drain
+        avg_run = self._run_total / self._completed if self._completed else 5.0
+        backlog = (self._queued + self._running) / self.workers
+        return max(1, round(avg_run * backlog))
+
+    def _start(self, submitted: float) -> float:
+        started = time.perf_counter()
+        wait = started - submitted
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._started += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._recent_waits.append(wait)
+        return started
+
+    def _finish(self, started: float, ok: bool) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._running -= 1
+            self._run_total += elapsed
+            if ok:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+    # ---------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on a worker thread and await its result."""
+        submitted = self._admit()
+
+        def job() -> T:
+            started = self._start(submitted)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                self._finish(started, ok)
+
+        return await asyncio.wrap_future(self._executor.submit(job))
+
+    def stream(self, factory: Callable[[], Iterator[T]]) -> AsyncIterator[T]:
+        """
+        Iterate factory() on a worker thread and relay its items to the loop.
+
+        Admission happens immediately (so QueueFullError can still become a
+        429); if the consumer goes away the worker stops and closes the
+        iterator, which ends llama.cpp decoding.
+        """
+        submitted = self._admit()
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def job() -> None:
+            started = self._start(submitted)
+            ok = False
+            it = None
+            try:
+                it = factory()
+                for item in it:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+                ok = True
+            except BaseException as exc:  # relayed to the consumer
+                loop.call_soon_threadsafe(items.put_nowait, exc)
+            finally:
+                if it is not None and hasattr(it, "close"):
+                    it.close()
+                self._finish(started, ok)
+                loop.call_soon_threadsafe(items.put_nowait, _DONE)
+
+        self._executor.submit(job)
+
+        async def relay() -> AsyncIterator[T]:
+            try:
+                while True:
+                    item = await items.get()
+                    if item is _DONE:
+                        return
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+            finally:
+                cancelled.set()
+
+        return relay()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            finished = self._completed + self._failed
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": 1000 * self._wait_total / self._started if self._started else 0.0,
+                "max_wait_ms": 1000 * self._wait_max,
+                "p95_wait_ms": 1000 * waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+                "avg_run_ms": 1000 * self._run_total / finished if finished else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -5,7 +5,7 @@ from __future__ import annotations
 from ai_tutor.models.base_loader import load_base_model
 from ai_tutor.models.lora_loader import load_finetuned_model
 from ai_tutor.models.inference import generate_answer
-from ai_tutor.rag.retriever import retrieve_context
+from ai_tutor.rag.retriever import get_retriever, retrieve_context
 
 
 def main() -> None:
@@ -15,6 +15,9 @@ def main() -> None:
     base_model, base_tokenizer = load_base_model()
     ft_model, ft_tokenizer = load_finetuned_model()
 
+    # Load the index + embedder once, not on the first question
+    get_retriever().warmup()
+
     while True:
         question = input("You: ").strip()
         if not question:
@@ -0,0 +1,98 @@
+# scripts/bench_ann.py
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from ai_tutor.rag.index import FaissIndex, FlatIndex, build_index
+from ai_tutor.rag.store import VectorStore, load_vector_store
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Report recall@k vs latency for the flat, IVF and HNSW retrieval backends."
+    )
+    parser.add_argument("--num-docs", type=int, default=100_000, help="Synthetic corpus size.")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dim (all-MiniLM-L6-v2 is 384).")
+    parser.add_argument("--num-queries", type=int, default=200, help="Queries to time.")
+    parser.add_argument("--top-k", type=int, default=3, help="k for recall@k (retrieve_context uses 3).")
+    parser.add_argument(
+        "--from-index",
+        action="store_true",
+        help="Benchmark the built RAG index instead of synthetic data (queries are perturbed rows).",
+    )
+    return parser.parse_args()
+
+
+def synthetic_store(num_docs: int, dim: int, rng: np.random.Generator) -> VectorStore:
+    # Clustered vectors behave more like sentence embeddings than pure noise
+    centers = rng.standard_normal((max(1, num_docs // 100), dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=num_docs)
+    embeddings = centers[labels] + 0.5 * rng.standard_normal((num_docs, dim)).astype(np.float32)
+    ids = [str(i) for i in range(num_docs)]
+    return VectorStore(model_name="synthetic", embeddings=embeddings, texts=ids, ids=ids, titles=ids)
+
+
+def make_queries(vs: VectorStore, n: int, rng: np.random.Generator) -> np.ndarray:
+    rows = rng.integers(0, len(vs.ids), size=n)
+    base = np.asarray(vs.embeddings[rows], dtype=np.float32)
+    return base + 0.3 * base.std() * rng.standard_normal(base.shape).astype(np.float32)
+
+
+def timed_search(index, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, float]:
+    # One query at a time, as retrieve_context does
+    rows: List[np.ndarray] = []
+    start = time.perf_counter()
+    for q in queries:
+        rows.append(index.search(q[None, :], top_k)[1][0])
+    elapsed_ms = 1000 * (time.perf_counter() - start) / len(queries)
+    return np.stack(rows), elapsed_ms
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(0)
+
+    vs = load_vector_store() if args.from_index else synthetic_store(args.num_docs, args.dim, rng)
+    queries = make_queries(vs, args.num_queries, rng)
+    top_k = min(args.top_k, len(vs.ids))
+
+    print("=== ANN Benchmark ===")
+    print(f"Docs:    {len(vs.ids)}  dim={vs.embeddings.shape[1]}")
+    print(f"Queries: {len(queries)}  top_k={top_k}")
+    print()
+    print(f"{'backend':<22}{'build s':>10}{'ms/query':>12}{'recall@k':>12}")
+
+    # Exact search is the ground truth; it has nothing to build
+    truth, flat_ms = timed_search(FlatIndex(vs.embeddings, vs.normalized), queries, top_k)
+    print(f"{'flat':<22}{0.0:>10.2f}{flat_ms:>12.3f}{1.0:>12.3f}")
+
+    for backend, knob, values in (
+        ("ivf", "nprobe", (1, 4, 8, 16, 64)),
+        ("hnsw", "ef_search", (16, 32, 64, 128)),
+    ):
+        start = time.perf_counter()
+        index = build_index(vs, backend)
+        build_s = time.perf_counter() - start
+        if not isinstance(index, FaissIndex):
+            print(f"{backend:<22}(faiss not installed)")
+            continue
+
+        for value in values:
+            index.set_search_params(**{knob: value})
+            found, ms = timed_search(index, queries, top_k)
+            label = f"{backend} {knob}={value}"
+            print(f"{label:<22}{build_s:>10.2f}{ms:>12.3f}{recall_at_k(found, truth):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# scripts/bench_batching.py
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List
+
+from ai_tutor.data_utils import load_eval_dataset
+from ai_tutor.llama_backend import (
+    BatchEngine,
+    _FINETUNED_SAMPLING,
+    _model_lock,
+    _restore_prefix,
+    adapter_registry,
+    get_finetuned_model,
+    resolve_adapter,
+)
+from ai_tutor.prompts import build_prompt
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare serial llama.cpp completions against the continuous batching engine."
+    )
+    parser.add_argument("--num-requests", type=int, default=8, help="Concurrent requests to simulate.")
+    parser.add_argument("--n-seq", type=int, default=4, help="Sequences decoded together by the engine.")
+    parser.add_argument("--max-tokens", type=int, default=128, help="Max new tokens per request.")
+    parser.add_argument("--adapter", default=None, help="LoRA adapter to run (default: the default adapter).")
+    return parser.parse_args()
+
+
+def load_prompts(n: int) -> List[str]:
+    questions = [ex.question for ex in load_eval_dataset()]
+    if not questions:
+        questions = ["What is a variable in programming?"]
+    questions = (questions * (n // len(questions) + 1))[:n]
+    return [build_prompt(question=q, mode="finetuned") for q in questions]
+
+
+def main() -> None:
+    args = parse_args()
+    prompts = load_prompts(args.num_requests)
+    adapter = resolve_adapter(True, args.adapter)
+    model = get_finetuned_model(adapter)
+
+    print("=== Batching Benchmark ===")
+    print(f"Adapter:    {adapter}")
+    print(f"Requests:   {len(prompts)}")
+    print(f"Max tokens: {args.max_tokens}")
+    print()
+
+    # Current path: one completion at a time on the shared Llama, with the
+    # adapter applied the way _complete does it
+    start = time.perf_counter()
+    serial_tokens = 0
+    for prompt in prompts:
+        with _model_lock(model):
+            _restore_prefix(model, "finetuned", adapter)
+            out = model(prompt, max_tokens=args.max_tokens, stop=["</s>"], **_FINETUNED_SAMPLING)
+        serial_tokens += out["usage"]["completion_tokens"]
+    serial_s = time.perf_counter() - start
+
+    # Engine path: all requests submitted at once, decoded together on a
+    # context with the same adapter
+    with _model_lock(model):
+        lora = adapter_registry.get(model, adapter)
+        adapter_registry.pin(adapter)
+    engine = BatchEngine(model, n_seq=args.n_seq, lora_adapter=lora)
+    start = time.perf_counter()
+    seqs = [engine.submit(p, args.max_tokens, _FINETUNED_SAMPLING) for p in prompts]
+    for seq in seqs:
+        for _ in seq:
+            pass
+    batched_s = time.perf_counter() - start
+    batched_tokens = sum(len(seq.generated) for seq in seqs)
+
+    serial_tps = serial_tokens / serial_s
+    batched_tps = batched_tokens / batched_s
+
+    print(f"Serial:  {serial_tokens} tokens in {serial_s:.2f}s -> {serial_tps:.1f} tok/s")
+    print(f"Batched: {batched_tokens} tokens in {batched_s:.2f}s -> {batched_tps:.1f} tok/s (n_seq={args.n_seq})")
+    print(f"Speedup: {batched_tps / serial_tps:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
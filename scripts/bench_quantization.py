@@ -0,0 +1,99 @@
+# scripts/bench_quantization.py
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from ai_tutor.rag.index import FlatIndex, QuantizedIndex
+from ai_tutor.rag.store import VectorStore, load_vector_store, quantize_store
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Memory, latency and recall@k of float32 / float16 / int8 / binary embedding storage."
+    )
+    parser.add_argument("--num-docs", type=int, default=100_000, help="Synthetic corpus size.")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dim (all-MiniLM-L6-v2 is 384).")
+    parser.add_argument("--num-queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument(
+        "--rescore-factors",
+        type=int,
+        nargs="+",
+        default=[1, 4, 10, 30],
+        help="Shortlist = top_k * factor rows rescored at full precision (1 = no rescoring).",
+    )
+    parser.add_argument(
+        "--from-index",
+        action="store_true",
+        help="Use the built RAG index instead of synthetic data (queries are perturbed rows).",
+    )
+    return parser.parse_args()
+
+
+def synthetic_store(num_docs: int, dim: int, rng: np.random.Generator) -> VectorStore:
+    # Clustered unit vectors behave more like sentence embeddings than pure noise
+    centers = rng.standard_normal((max(1, num_docs // 100), dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=num_docs)
+    embeddings = centers[labels] + 0.5 * rng.standard_normal((num_docs, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    ids = [str(i) for i in range(num_docs)]
+    return VectorStore(
+        model_name="synthetic",
+        embeddings=embeddings,
+        texts=ids,
+        ids=ids,
+        titles=ids,
+        normalized=True,
+    )
+
+
+def timed(index, queries: np.ndarray, top_k: int):
+    start = time.perf_counter()
+    rows = np.stack([index.search(q[None, :], top_k)[1][0] for q in queries])
+    return rows, 1000 * (time.perf_counter() - start) / len(queries)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return sum(len(set(f) & set(t)) for f, t in zip(found, truth)) / truth.size
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(0)
+
+    vs = load_vector_store() if args.from_index else synthetic_store(args.num_docs, args.dim, rng)
+    embeddings = np.asarray(vs.embeddings, dtype=np.float32)
+    rows = rng.integers(0, len(embeddings), size=args.num_queries)
+    queries = embeddings[rows] + 0.05 * rng.standard_normal((args.num_queries, embeddings.shape[1])).astype(np.float32)
+    top_k = min(args.top_k, len(embeddings))
+
+    print("=== Quantization Benchmark ===")
+    print(f"Docs: {len(embeddings)}  dim={embeddings.shape[1]}  queries={len(queries)}  top_k={top_k}")
+    print()
+    print(f"{'storage':<22}{'scanned MB':>12}{'vs f32':>8}{'ms/query':>10}{'recall@k':>10}")
+
+    truth, ms = timed(FlatIndex(embeddings), queries, top_k)
+    print(f"{'float32':<22}{embeddings.nbytes / 1e6:>12.1f}{1.0:>7.2f}x{ms:>10.2f}{1.0:>10.3f}")
+
+    half = embeddings.astype(np.float16)
+    found, ms = timed(FlatIndex(half), queries, top_k)
+    print(f"{'float16':<22}{half.nbytes / 1e6:>12.1f}{half.nbytes / embeddings.nbytes:>7.2f}x{ms:>10.2f}{recall(found, truth):>10.3f}")
+
+    for kind in ("int8", "binary"):
+        quantized = quantize_store(vs, kind)
+        for factor in args.rescore_factors:
+            index = QuantizedIndex(vs, quantized, rescore_factor=factor)
+            found, ms = timed(index, queries, top_k)
+            label = f"{kind} rescore x{factor}" if factor > 1 else f"{kind} (no rescore)"
+            print(
+                f"{label:<22}{quantized.nbytes / 1e6:>12.1f}{quantized.nbytes / embeddings.nbytes:>7.2f}x"
+                f"{ms:>10.2f}{recall(found, truth):>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# scripts/bench_speculative.py
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, Tuple
+
+from ai_tutor.data_utils import load_eval_dataset
+from ai_tutor.llama_backend import (
+    _complete,
+    count_tokens,
+    get_finetuned_model,
+    prompt_lookup,
+    sampling_params,
+)
+from ai_tutor.prompts import build_prompt
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare greedy decoding with and without prompt-lookup speculative decoding."
+    )
+    parser.add_argument("--num-requests", type=int, default=8, help="Validation questions to answer.")
+    parser.add_argument("--max-tokens", type=int, default=256, help="Max new tokens per request.")
+    return parser.parse_args()
+
+
+def load_prompts(n: int) -> List[str]:
+    questions = [ex.question for ex in load_eval_dataset()]
+    if not questions:
+        questions = ["What is a variable in programming?"]
+    return [build_prompt(question=q, mode="finetuned") for q in questions[:n]]
+
+
+def run(prompts: List[str], max_tokens: int) -> Tuple[List[str], int, float]:
+    greedy = sampling_params(True, temperature=0.0)
+    outputs = []
+    start = time.perf_counter()
+    for prompt in prompts:
+        outputs.append(_complete(True, prompt, max_tokens, greedy))
+    elapsed = time.perf_counter() - start
+    return outputs, sum(count_tokens(o) for o in outputs), elapsed
+
+
+def main() -> None:
+    args = parse_args()
+    if prompt_lookup is None:
+        print("Set LLAMA_SPECULATIVE=1 (the draft model is attached when the model loads).")
+        return
+
+    prompts = load_prompts(args.num_requests)
+    model = get_finetuned_model()
+
+    print("=== Speculative Decoding Benchmark ===")
+    print(f"Requests:   {len(prompts)}")
+    print(f"Max tokens: {args.max_tokens}")
+    print()
+
+    # Same model and context both times; only the draft model is toggled
+    model.draft_model = None
+    plain, plain_tokens, plain_s = run(prompts, args.max_tokens)
+    model.draft_model = prompt_lookup
+    drafted, drafted_tokens, drafted_s = run(prompts, args.max_tokens)
+
+    plain_tps = plain_tokens / plain_s
+    drafted_tps = drafted_tokens / drafted_s
+    stats = prompt_lookup.stats()
+    mismatches = sum(a != b for a, b in zip(plain, drafted))
+
+    print(f"Plain:       {plain_tokens} tokens in {plain_s:.2f}s -> {plain_tps:.1f} tok/s")
+    print(f"Speculative: {drafted_tokens} tokens in {drafted_s:.2f}s -> {drafted_tps:.1f} tok/s")
+    print(f"Speedup:     {drafted_tps / plain_tps:.2f}x")
+    print(f"Acceptance:  {stats['accepted']}/{stats['drafted']} drafts ({stats['acceptance_rate']:.1%})")
+    print(f"Outputs differing from plain greedy: {mismatches}/{len(prompts)}")
+
+
+if __name__ == "__main__":
+    main()
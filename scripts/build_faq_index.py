@@ -0,0 +1,118 @@
+# scripts/build_faq_index.py
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import List
+
+from ai_tutor.answer_cache import normalize_question
+from ai_tutor.config import Config
+from ai_tutor.faq_index import FAQIndex
+from ai_tutor.llama_backend import generate_answer, model_fingerprint
+from ai_tutor.rag.query_cache import get_query_cache
+from ai_tutor.rag.store import _get_embedder
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Precompute /chat answers for the validation questions and a curated FAQ list."
+    )
+    parser.add_argument(
+        "--faq",
+        type=Path,
+        default=Config.faq_questions_path,
+        help="Curated questions: .jsonl with a 'question' field, or one question per line.",
+    )
+    parser.add_argument(
+        "--val",
+        type=Path,
+        default=Config.data_dir / "val" / "val.jsonl",
+        help="Validation set whose questions are included too.",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["base", "finetuned"],
+        default=["base", "finetuned"],
+        help="Modes to precompute answers for.",
+    )
+    parser.add_argument("--output", type=Path, default=Config.faq_index_path)
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate every answer (by default answers from the same weights are kept).",
+    )
+    return parser.parse_args()
+
+
+def load_questions(path: Path) -> List[str]:
+    if not path.exists():
+        print(f"[FAQ] {path} not found, skipping.")
+        return []
+
+    questions = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.suffix == ".jsonl":
+                question = json.loads(line).get("question")
+                if question:
+                    questions.append(question)
+            else:
+                questions.append(line)
+    return questions
+
+
+def main() -> None:
+    args = parse_args()
+
+    questions: List[str] = []
+    seen = set()
+    for question in load_questions(args.val) + load_questions(args.faq):
+        key = normalize_question(question)
+        if key not in seen:
+            seen.add(key)
+            questions.append(question)
+    if not questions:
+        print("No questions found. Exiting.")
+        return
+
+    previous = None if args.force else FAQIndex.load(args.output)
+    entries = []
+    for mode in args.modes:
+        use_finetuned = mode == "finetuned"
+        fingerprint = model_fingerprint(use_finetuned)
+        print(f"=== {mode} ({fingerprint}) ===")
+
+        for idx, question in enumerate(questions, start=1):
+            entry = previous.find(question, use_finetuned, fingerprint) if previous else None
+            if entry is None:
+                start = time.perf_counter()
+                answer, model_type = generate_answer(question=question, use_finetuned=use_finetuned)
+                entry = {
+                    "question": question,
+                    "finetuned": use_finetuned,
+                    "answer": answer,
+                    "model_type": model_type,
+                    "fingerprint": fingerprint,
+                }
+                print(f"[{idx}/{len(questions)}] {question} ({time.perf_counter() - start:.1f}s)")
+            else:
+                print(f"[{idx}/{len(questions)}] {question} (kept)")
+            entries.append(entry)
+
+    # Same (normalized) embedding path /chat uses at lookup time
+    model_name = Config.embedding_model_id
+    vectors = get_query_cache().encode(_get_embedder(model_name), model_name, [e["question"] for e in entries])
+    index = FAQIndex(entries, vectors, model_name)
+    index.save(args.output)
+    print(f"\nSaved {len(entries)} answers to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
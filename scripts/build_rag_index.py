@@ -3,10 +3,14 @@
 from __future__ import annotations
 
 import argparse
+from pathlib import Path
 
 from ai_tutor.config import Config
-from ai_tutor.rag.ingest import ingest_reference_corpus
-from ai_tutor.rag.store import save_vector_store
+from ai_tutor.rag.index import BACKENDS, load_index
+from ai_tutor.rag.ingest import ingest_reference_corpus, iter_corpus_documents
+from ai_tutor.rag.lexical import load_bm25_index
+from ai_tutor.rag.parallel_build import build_vector_store_parallel
+from ai_tutor.rag.store import QUANTIZATIONS, compact_vector_store, index_file_path, save_vector_store, update_vector_store
 
 
 def parse_args() -> argparse.Namespace:
@@ -14,7 +18,57 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--rebuild",
         action="store_true",
-        help="If set, rebuild index from scratch.",
+        help="If set, rebuild index from scratch (otherwise only new or changed chunks are embedded).",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Rewrite the index without tombstoned chunks after updating.",
+    )
+    parser.add_argument(
+        "--source",
+        type=Path,
+        default=None,
+        help=(
+            "Directory of course material (.md/.txt/code/.jsonl) or a .jsonl file. "
+            "Defaults to RAG_CORPUS_PATH, or the built-in reference docs if that does not exist."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=Config.rag_embed_workers,
+        help="Embedding processes for full builds; >1 shards chunks across a process pool.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=Config.rag_embed_batch_size,
+        help="Encoder batch size for parallel builds (0 = pick the fastest on a sample).",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=Config.rag_embed_shard_size,
+        help="Chunks per checkpointed shard in parallel builds.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=Config.rag_index_backend,
+        help="Search index to train and persist next to the vectors (default: RAG_INDEX_BACKEND).",
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=QUANTIZATIONS,
+        default=Config.rag_quantization,
+        help="Compact int8/binary copy for the flat backend (default: RAG_QUANTIZATION).",
+    )
+    parser.add_argument(
+        "--bm25",
+        action=argparse.BooleanOptionalAction,
+        default=Config.rag_retrieval_mode != "dense",
+        help="Also build the BM25 index used by hybrid/prefilter retrieval.",
     )
     return parser.parse_args()
 
@@ -25,15 +79,49 @@ def main() -> None:
     print("=== Build RAG Index ===")
     print(f"RAG index path: {Config.rag_index_path}")
     print(f"Rebuild:        {args.rebuild}")
+    print(f"Backend:        {args.backend}")
+    print(f"Workers:        {args.workers}")
+
+    source = args.source or Config.rag_corpus_path
+    if args.source or source.exists():
+        print(f"Source:         {source}")
+        # Generator: files are read, chunked and embedded batch by batch
+        docs = iter_corpus_documents(source)
+    else:
+        print("Source:         built-in reference docs")
+        docs = ingest_reference_corpus()
     print()
 
-    docs = ingest_reference_corpus()
-    vector_store = save_vector_store(docs, rebuild=args.rebuild)
+    if (args.rebuild or not index_file_path().exists()) and args.workers > 1:
+        vector_store, stats = build_vector_store_parallel(
+            docs,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            shard_size=args.shard_size,
+        )
+        print(
+            f"Parallel build: {stats['chunks']} chunks from {stats['docs']} docs in {stats['seconds']:.1f}s "
+            f"({stats['docs_per_s']:.1f} docs/s, {stats['chunks_per_s']:.1f} chunks/s, "
+            f"workers={stats['workers']}, batch_size={stats['batch_size']}, "
+            f"resumed {stats['resumed_chunks']} chunks)"
+        )
+    elif args.rebuild or not index_file_path().exists():
+        vector_store = save_vector_store(docs, rebuild=True)
+    else:
+        vector_store, stats = update_vector_store(docs)
+        print("Incremental update: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+    if args.compact:
+        vector_store = compact_vector_store()
+    search_index = load_index(vector_store, backend=args.backend, quantization=args.quantization)
+    if args.bm25:
+        bm25 = load_bm25_index(vector_store)
+        print(f"BM25 index: {len(bm25.vocab)} terms, {len(bm25.docs)} postings")
 
     print("RAG index built.")
     print(f"Stored at: {Config.rag_index_path}")
-    print(f"Number of documents: {len(docs)}")
+    print(f"Number of chunks: {vector_store.num_live}")
     print(f"Vector store summary: {vector_store}")
+    print(f"Search index: {search_index.backend}")
 
 
 if __name__ == "__main__":
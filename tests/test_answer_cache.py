@@ -0,0 +1,24 @@
+# tests/test_answer_cache.py
+
+import sqlite3
+
+from ai_tutor.answer_cache import _PRUNE_EVERY, AnswerCache
+
+
+def _disk_rows(path) -> int:
+    with sqlite3.connect(str(path)) as db:
+        return db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+def test_disk_tier_is_pruned_periodically(tmp_path):
+    db_path = tmp_path / "answers.sqlite"
+    cache = AnswerCache(max_entries=4, db_path=db_path, max_disk_entries=3)
+
+    for i in range(_PRUNE_EVERY - 1):
+        cache.put(f"key-{i}", f"answer {i}", "base-llama")
+    assert _disk_rows(db_path) == _PRUNE_EVERY - 1
+
+    cache.put("last", "answer", "base-llama")
+    assert _disk_rows(db_path) == 3
+    # The newest rows survive, and disk hits come back after a restart
+    assert AnswerCache(max_entries=4, db_path=db_path).get("last") == ("answer", "base-llama")
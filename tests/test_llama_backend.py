@@ -0,0 +1,91 @@
+# tests/test_llama_backend.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("llama_cpp")
+
+from ai_tutor.llama_backend import (  # noqa: E402
+    _clean_finetuned_stream,
+    _StructureStop,
+    _finalize_finetuned,
+    _finalize_grammar,
+    _GrammarStreamCleaner,
+    _sample_token,
+    _truncate_candidates,
+    early_stop_stats,
+)
+
+RAW_OUTPUTS = [
+    "",
+    "   \n ",
+    "[INST]",
+    "Loops repeat code over and over.",
+    "1. Loops repeat code.",
+    "Sure, here you go.\n1. Loops repeat code.",
+    "Sure, here you go.\n1. Loops repeat code.\n2. for i in range(3):  print(i)\n3. Off by one. Why?",
+    "1. A loop repeats code.\n\n2. for i in range(3): print(i)\n\n3. Forgetting the counter.",
+    "1. Loops [INST] repeat.\n2. <<SYS>>Example  with   spaces.\n3. Mistake.[/INST] What is i?",
+    "1. Idea.\n2. Example. Check your answer by comparing it.\n3. Mistake?",
+    "1. Idea.\n2. Example.\n3. Mistake. check your answer by comparing the two.",
+    "1. Idea. Check your answer by comparing outputs.",
+    "1. Idea.\n2. Steps: 1. Init 2. Loop\n3. Mistake?\n4. Extra section.",
+    "1. 2. 3. 4. x",
+    "1. Idea.\n2. Example.\n3. Mistake?\nStudent question: what is a list?",
+    "1. Idea [/[INST]INST] here.\n2. Example 10. items.\n3. Done",
+    "Tutor answer: 1. Idea.\nStudent answer: 2. Example\n\n\n3. Mistake.  Why?",
+]
+
+
+def _stream(raw: str, size: int, cleaner=None) -> str:
+    pieces = (raw[i:i + size] for i in range(0, len(raw), size))
+    return "".join(_clean_finetuned_stream(pieces, cleaner=cleaner))
+
+
+@pytest.mark.parametrize("raw", RAW_OUTPUTS)
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_stream_cleaner_matches_chat_output(raw, size):
+    assert _stream(raw, size) == _finalize_finetuned(raw)
+
+
+def test_sampler_cuts_candidates_before_temperature():
+    # Temperature-1 probs ~ [.474, .287, .174, .064, .0004]: top_p=0.9 keeps 3.
+    # Scaling by temperature 0.5 first would have kept only 2.
+    logits = np.array([2.0, 1.5, 1.0, 0.0, -5.0], dtype=np.float32)
+    assert _truncate_candidates(logits, top_p=0.9, min_p=0.0) == 3
+    assert _truncate_candidates(logits, top_p=1.0, min_p=0.1) == 4
+
+    rng = np.random.default_rng(0)
+    seen = {
+        _sample_token(logits, [], rng, temperature=0.5, top_p=0.9, min_p=0.0)
+        for _ in range(2000)
+    }
+    assert seen == {0, 1, 2}
+
+
+GRAMMAR_OUTPUT = (
+    "1. Core Idea\nA loop repeats code.\nTutor answer:\n\n"
+    "2. Step-by-Step Example\nfor i in range(3): print(i)\n\n"
+    "3. Common Mistake + Check-Your-Understanding Question\nOff by one.\n"
+    "Student question: what is a list?"
+)
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_grammar_output_drops_prompt_echoes(size):
+    expected = (
+        "1. Core Idea\nA loop repeats code.\n\n"
+        "2. Step-by-Step Example\nfor i in range(3): print(i)\n\n"
+        "3. Common Mistake + Check-Your-Understanding Question\nOff by one."
+    )
+    assert _finalize_grammar(GRAMMAR_OUTPUT) == expected
+    assert _stream(GRAMMAR_OUTPUT, size, _GrammarStreamCleaner()) == expected
+
+
+def test_early_stop_counts_closed_streams():
+    before = early_stop_stats.stats()["requests"]
+    pieces = (p for p in ["1. Loops ", "repeat code.\n", "2. Example.\n"])
+    stream = _clean_finetuned_stream(pieces, stop=_StructureStop())
+    next(stream)
+    stream.close()
+    assert early_stop_stats.stats()["requests"] == before + 1
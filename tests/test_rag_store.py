@@ -0,0 +1,38 @@
+# tests/test_rag_store.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from ai_tutor.rag import store  # noqa: E402
+from ai_tutor.rag.ingest import iter_corpus_documents  # noqa: E402
+
+
+class _CountingEmbedder:
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False):
+        self.encoded += len(texts)
+        out = np.stack([np.random.default_rng(len(t)).standard_normal(8) for t in texts])
+        return (out / np.linalg.norm(out, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_renamed_file_reuses_its_vectors(tmp_path, monkeypatch):
+    embedder = _CountingEmbedder()
+    monkeypatch.setattr(store, "_get_embedder", lambda model_name=None: embedder)
+    corpus, index_dir = tmp_path / "corpus", tmp_path / "index"
+    corpus.mkdir()
+    (corpus / "loops.txt").write_text("A for loop repeats code.", encoding="utf-8")
+    (corpus / "lists.txt").write_text("A list holds items in order.", encoding="utf-8")
+    store.update_vector_store(iter_corpus_documents(corpus), index_dir)
+
+    # The title of a .txt file comes from its name, so it changes too
+    (corpus / "loops.txt").rename(corpus / "for_loops.txt")
+    vs, stats = store.update_vector_store(iter_corpus_documents(corpus), index_dir)
+
+    assert stats == {"unchanged": 1, "added": 0, "changed": 0, "moved": 1, "removed": 1, "embedded": 0}
+    assert embedder.encoded == 2
+    live = {vs.ids[row]: vs.titles[row] for row in range(len(vs.ids)) if vs.deleted is None or not vs.deleted[row]}
+    assert live == {"lists.txt": "lists", "for_loops.txt": "for loops"}
@@ -0,0 +1,63 @@
+# tests/test_rerank.py
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from ai_tutor.rag import rerank  # noqa: E402
+
+
+class _Clock:
+    def __init__(self):
+        self.ms = 0.0
+
+    def perf_counter(self):
+        return self.ms / 1000
+
+
+class _FakeModel:
+    """Cross-encoder stand-in costing `pair_ms` of fake time per pair."""
+
+    def __init__(self, clock, pair_ms):
+        self.clock = clock
+        self.pair_ms = pair_ms
+        self.batches = []
+
+    def predict(self, pairs):
+        self.batches.append(list(pairs))
+        self.clock.ms += self.pair_ms * len(pairs)
+        return [float(len(text)) for _, text in pairs]
+
+
+def _reranker(monkeypatch, pair_ms, budget_ms):
+    clock = _Clock()
+    monkeypatch.setattr(rerank, "time", clock)
+    model = _FakeModel(clock, pair_ms)
+    reranker = rerank.Reranker("fake", budget_ms=budget_ms, batch_size=8)
+    monkeypatch.setattr(reranker, "_get_model", lambda: model)
+    return reranker, model, clock
+
+
+HITS = [(f"t{i}", "x" * (i + 1)) for i in range(20)]
+
+
+def test_scores_the_normalized_question(monkeypatch):
+    reranker, model, _ = _reranker(monkeypatch, pair_ms=1.0, budget_ms=1000)
+    out = reranker.rerank("  What IS a Loop?? ", HITS, top_n=3)
+    assert out == [HITS[19], HITS[18], HITS[17]]
+    assert {q for batch in model.batches for q, _ in batch} == {"what is a loop"}
+
+    # A question normalizing to the same key is served from the cache
+    model.batches.clear()
+    reranker.rerank("what is a loop", HITS, top_n=3)
+    assert model.batches == []
+
+
+def test_batches_stay_within_the_budget(monkeypatch):
+    reranker, model, clock = _reranker(monkeypatch, pair_ms=10.0, budget_ms=55)
+    out = reranker.rerank("What is a loop?", HITS, top_n=3)
+
+    assert out == HITS[:3]  # gave up: retrieval order kept
+    assert [len(b) for b in model.batches] == [1, 4]
+    assert clock.ms <= 55
+    assert reranker.stats()["gave_up"] == 1
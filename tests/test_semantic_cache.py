@@ -0,0 +1,25 @@
+# tests/test_semantic_cache.py
+
+import numpy as np
+
+from ai_tutor.semantic_cache import SemanticAnswerCache
+
+
+def _embed(texts):
+    return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_zero_capacity_disables_cache():
+    cache = SemanticAnswerCache(capacity=0, embed=_embed)
+    cache.put("What is a loop?", "scope", "answer", "base-llama")
+    assert cache.lookup("What is a loop?", "scope") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_scope_ids_are_freed_with_their_rows():
+    cache = SemanticAnswerCache(capacity=2, threshold=0.5, embed=_embed)
+    for i in range(50):
+        cache.put("What is a loop?", f"context-{i}", f"answer {i}", "base-llama")
+    assert cache.stats()["scopes"] == 2
+    assert cache.lookup("What is a loop?", "context-49")[0] == "answer 49"
+    assert cache.lookup("What is a loop?", "context-0") is None